@@ -0,0 +1,56 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from app.responses import dumps
+
+ScrapeFunc = Callable[[str, Optional[str]], Awaitable[Dict[str, Any]]]
+
+
+def _host_of(url: str) -> str:
+    if not url.lower().startswith(("http://", "https://")):
+        url = "https://" + url
+    return urlsplit(url).netloc.lower()
+
+
+def error_record(exc: BaseException) -> Dict[str, Any]:
+    """Turn a failed scrape into a per-item error payload"""
+    if isinstance(exc, asyncio.TimeoutError):
+        return {"status": 408, "error": {"message": "Item timed out", "error": "Timeout"}}
+    detail = getattr(exc, "detail", None)
+    if detail is None:
+        detail = {"message": "Unexpected error during scraping", "error": str(exc), "error_type": type(exc).__name__}
+    return {"status": getattr(exc, "status_code", 500), "error": detail}
+
+
+async def run_batch(items: List[Dict[str, Any]], scrape: ScrapeFunc,
+                    concurrency: int, per_host: int) -> AsyncIterator[Dict[str, Any]]:
+    """Scrape items concurrently and yield one record per item in completion order"""
+    global_slots = asyncio.Semaphore(concurrency)
+    host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    async def run_item(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        record = {"index": index, "url": item["url"], "type": item.get("type")}
+        host = _host_of(item["url"] or "")
+        host_slot = host_slots.setdefault(host, asyncio.Semaphore(per_host))
+        try:
+            # Take the host slot first so items queued behind a busy host don't hold global slots
+            async with host_slot, global_slots:
+                result = await scrape(item["url"], item.get("type"))
+            return {**record, "status": 200, "result": result}
+        except Exception as exc:
+            return {**record, **error_record(exc)}
+
+    tasks = [asyncio.ensure_future(run_item(index, item)) for index, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away or the stream was closed early
+        for task in tasks:
+            task.cancel()
+
+
+async def ndjson_lines(records: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    async for record in records:
+        yield dumps(record) + b"\n"
@@ -0,0 +1,323 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+CACHE_MODES = {"bypass", "prefer", "only"}
+
+_MAX_AGE_PATTERN = re.compile(r"(?:^|,)\s*(s-maxage|max-age)\s*=\s*\"?(\d+)\"?", re.IGNORECASE)
+
+Loader = Callable[[str, Dict[str, str]], Awaitable[Dict[str, Any]]]
+
+
+class CacheMiss(Exception):
+    """Raised for cache=only requests when the URL has not been cached yet"""
+
+
+def parse_cache_control(headers: Dict[str, str], default_ttl: float, max_ttl: float) -> Tuple[bool, float]:
+    """Return (storable, ttl_seconds) for a response according to its Cache-Control header"""
+    cache_control = ""
+    for name, value in headers.items():
+        if name.lower() == "cache-control":
+            cache_control = value.lower()
+            break
+    directives = {part.split("=", 1)[0].strip() for part in cache_control.split(",") if part.strip()}
+    if "no-store" in directives:
+        return False, 0.0
+    if "no-cache" in directives:
+        return True, 0.0
+    ages = dict((name.lower(), int(value)) for name, value in _MAX_AGE_PATTERN.findall(cache_control))
+    ttl = ages.get("s-maxage", ages.get("max-age", default_ttl))
+    return True, float(min(ttl, max_ttl))
+
+
+class CacheEntry:
+    __slots__ = ("url", "content", "proxy_used", "etag", "last_modified", "stored_at", "expires_at", "truncated", "size")
+
+    def __init__(self, url: str, content: str, proxy_used: str, etag: Optional[str],
+                 last_modified: Optional[str], stored_at: float, expires_at: float, truncated: bool = False):
+        self.url = url
+        self.content = content
+        self.proxy_used = proxy_used
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        self.truncated = truncated
+        self.size = len(content.encode("utf-8"))
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) < self.expires_at
+
+    def validators(self) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__ if name != "size"}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CacheEntry":
+        return cls(**data)
+
+
+class FetchCache:
+    """Two-tier (memory LRU + optional gzip on disk) page cache with single-flight loading"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self._memory: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._memory_bytes = 0
+        self._inflight: Dict[str, "asyncio.Future[Tuple[CacheEntry, str]]"] = {}
+        # URLs whose in-flight load other requests have joined, and who to tell when that happens
+        self._joined: Set[str] = set()
+        self._on_join: Dict[str, Callable[[], None]] = {}
+        self._disk_bytes = 0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "revalidated": 0,
+            "coalesced": 0,
+            "bypassed": 0,
+            "disk_hits": 0,
+            "bytes_served": 0,
+            "bytes_fetched": 0,
+        }
+        if self.config["disk_dir"]:
+            os.makedirs(self.config["disk_dir"], exist_ok=True)
+            self._disk_bytes = sum(
+                entry.stat().st_size for entry in os.scandir(self.config["disk_dir"]) if entry.is_file()
+            )
+
+    async def fetch(self, url: str, loader: Loader, mode: str = "prefer") -> Tuple[CacheEntry, str]:
+        """Return (entry, cache_status) for a URL, loading it through `loader` when needed"""
+        if mode == "bypass" or not self.config["enabled"]:
+            self._stats["bypassed"] += 1
+            entry, _ = await self._load(url, None, loader)
+            return entry, "bypass"
+
+        entry = await self._lookup(url)
+        if mode == "only":
+            if entry is None:
+                self._stats["misses"] += 1
+                raise CacheMiss(f"URL is not cached: {url}")
+            self._count_hit(entry)
+            return entry, "hit" if entry.is_fresh() else "stale"
+
+        if entry is not None and entry.is_fresh():
+            self._count_hit(entry)
+            return entry, "hit"
+
+        # Single-flight: concurrent requests for the same URL share one upstream fetch
+        inflight = self._inflight.get(url)
+        if inflight is not None:
+            self._stats["coalesced"] += 1
+            self._joined.add(url)
+            callback = self._on_join.pop(url, None)
+            if callback is not None:
+                callback()
+            entry, _ = await asyncio.shield(inflight)
+            self._stats["bytes_served"] += entry.size
+            return entry, "coalesced"
+
+        task = asyncio.ensure_future(self._load(url, entry, loader))
+        self._inflight[url] = task
+        task.add_done_callback(lambda done: self._finish(url, done))
+        return await asyncio.shield(task)
+
+    def on_join(self, url: str, callback: Callable[[], None]) -> bool:
+        """Call `callback` once another request joins the in-flight load of `url` (now, if one has)
+
+        Returns False when no load of `url` is registered, so nobody can join it.
+        """
+        if url not in self._inflight:
+            return False
+        if url in self._joined:
+            callback()
+        else:
+            self._on_join[url] = callback
+        return True
+
+    def detach(self, url: str) -> None:
+        """Let requests arriving from now on load `url` themselves instead of joining"""
+        self._inflight.pop(url, None)
+        self._joined.discard(url)
+        self._on_join.pop(url, None)
+
+    def storable(self, headers: Dict[str, str]) -> bool:
+        """Whether a response with these headers will be stored"""
+        return self.config["enabled"] and parse_cache_control(headers, self.config["default_ttl"], self.config["max_ttl"])[0]
+
+    def _finish(self, url: str, task: "asyncio.Future[Tuple[CacheEntry, str]]") -> None:
+        if self._inflight.get(url) is task:
+            # A detached load must not unregister the one that replaced it
+            self.detach(url)
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def _count_hit(self, entry: CacheEntry) -> None:
+        self._stats["hits"] += 1
+        self._stats["bytes_served"] += entry.size
+
+    async def _load(self, url: str, entry: Optional[CacheEntry], loader: Loader) -> Tuple[CacheEntry, str]:
+        validators = entry.validators() if entry is not None else {}
+        result = await loader(url, validators)
+
+        if result["status"] == 304 and entry is not None:
+            # Not modified: keep the stored body, refresh its lifetime
+            _, ttl = parse_cache_control(result.get("headers", {}), self.config["default_ttl"], self.config["max_ttl"])
+            entry.stored_at = time.time()
+            entry.expires_at = entry.stored_at + ttl
+            self._stats["revalidated"] += 1
+            self._stats["bytes_served"] += entry.size
+            await self.store(entry)
+            return entry, "revalidated"
+
+        fresh = await self.store_result(url, result)
+        return fresh, "miss"
+
+    async def store_result(self, url: str, result: Dict[str, Any]) -> CacheEntry:
+        """Build an entry from a fetch result and store it if the response allows caching
+
+        Loaders can set `cacheable: False` on a result to pass it on without storing it.
+        """
+        headers = result.get("headers", {})
+        storable, ttl = parse_cache_control(headers, self.config["default_ttl"], self.config["max_ttl"])
+        now = time.time()
+        entry = CacheEntry(
+            url=url,
+            content=result["content"],
+            proxy_used=result.get("proxy_used", "Unknown proxy"),
+            etag=headers.get("etag"),
+            last_modified=headers.get("last-modified"),
+            stored_at=now,
+            expires_at=now + ttl,
+            truncated=result.get("truncated", False),
+        )
+        self._stats["misses"] += 1
+        self._stats["bytes_fetched"] += entry.size
+        if storable and self.config["enabled"] and result.get("cacheable", True):
+            await self.store(entry)
+        return entry
+
+    def peek(self, url: str) -> Optional[CacheEntry]:
+        """Return a fresh in-memory entry without touching LRU order or counters"""
+        entry = self._memory.get(url)
+        return entry if entry is not None and entry.is_fresh() else None
+
+    async def known(self, url: str) -> bool:
+        """True if the URL is being loaded or stored (even stale), so fetch() can join or revalidate"""
+        return url in self._inflight or await self._lookup(url) is not None
+
+    async def _lookup(self, url: str) -> Optional[CacheEntry]:
+        entry = self._memory.get(url)
+        if entry is not None:
+            self._memory.move_to_end(url)
+            return entry
+        if not self.config["disk_dir"]:
+            return None
+        entry = await asyncio.to_thread(self._read_disk, url)
+        if entry is not None:
+            self._stats["disk_hits"] += 1
+            self._remember(entry)
+        return entry
+
+    async def store(self, entry: CacheEntry) -> None:
+        """Insert or refresh an entry in both tiers"""
+        self._remember(entry)
+        if self.config["disk_dir"]:
+            await asyncio.to_thread(self._write_disk, entry)
+
+    def _remember(self, entry: CacheEntry) -> None:
+        previous = self._memory.pop(entry.url, None)
+        if previous is not None:
+            self._memory_bytes -= previous.size
+        if entry.size > self.config["memory_max_bytes"]:
+            return
+        self._memory[entry.url] = entry
+        self._memory_bytes += entry.size
+        while self._memory_bytes > self.config["memory_max_bytes"]:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.size
+
+    def _disk_path(self, url: str) -> str:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.config["disk_dir"], f"{digest}.json.gz")
+
+    def _read_disk(self, url: str) -> Optional[CacheEntry]:
+        try:
+            with open(self._disk_path(url), "rb") as f:
+                data = json.loads(gzip.decompress(f.read()))
+        except (OSError, ValueError):
+            return None
+        try:
+            entry = CacheEntry.from_dict(data)
+        except TypeError:
+            return None
+        return entry if entry.url == url else None
+
+    def _write_disk(self, entry: CacheEntry) -> None:
+        path = self._disk_path(entry.url)
+        payload = gzip.compress(json.dumps(entry.to_dict()).encode("utf-8"), compresslevel=5)
+        try:
+            previous = os.path.getsize(path)
+        except OSError:
+            previous = 0
+        # Unique per call: a revalidation and a streamed store of the same URL may overlap
+        fd, tmp_path = tempfile.mkstemp(dir=self.config["disk_dir"], prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._disk_bytes += len(payload) - previous
+        if self._disk_bytes > self.config["disk_max_bytes"]:
+            self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        files = sorted(
+            # Temp files belong to writes in progress
+            (entry for entry in os.scandir(self.config["disk_dir"]) if entry.is_file() and not entry.name.endswith(".tmp")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        total = sum(entry.stat().st_size for entry in files)
+        for entry in files:
+            if total <= self.config["disk_max_bytes"]:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            total -= size
+        self._disk_bytes = total
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"] + self._stats["revalidated"] + self._stats["coalesced"]
+        return {
+            **self._stats,
+            "hit_ratio": round((lookups - self._stats["misses"]) / lookups, 4) if lookups else 0.0,
+            "inflight": len(self._inflight),
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "memory_max_bytes": self.config["memory_max_bytes"],
+            "disk_enabled": bool(self.config["disk_dir"]),
+            "disk_bytes": self._disk_bytes,
+            "disk_max_bytes": self.config["disk_max_bytes"],
+        }
@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Pattern, Tuple
+from urllib.parse import urldefrag, urlsplit
+from urllib.robotparser import RobotFileParser
+
+from app.batch import error_record
+
+CRAWL_SCOPES = {"domain", "regex"}
+
+# fetch_page(url) -> {"result": ..., "links": [absolute urls], ...}
+PageFetcher = Callable[[str], Awaitable[Dict[str, Any]]]
+# fetch_robots(robots_url) -> robots.txt body, or None if there is none
+RobotsFetcher = Callable[[str], Awaitable[Optional[str]]]
+
+
+class BloomFilter:
+    """Fixed-size set of seen URLs; may report a URL as seen that never was (at `error_rate`)"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> List[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> bool:
+        """Add an item; returns False if it was (probably) already present"""
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position // 8] & (1 << (position % 8)) for position in self._positions(item))
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+
+class RobotsCache:
+    """robots.txt rules per origin, fetched once and kept for `ttl` seconds (LRU bounded)"""
+
+    def __init__(self, fetch: RobotsFetcher, user_agent: str, ttl: float, max_entries: int = 1024):
+        self.fetch = fetch
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, RobotFileParser]]" = OrderedDict()
+        self._inflight: Dict[str, "asyncio.Future[RobotFileParser]"] = {}
+
+    async def _rules(self, origin: str) -> RobotFileParser:
+        cached = self._entries.get(origin)
+        if cached is not None and cached[0] > time.time():
+            self._entries.move_to_end(origin)
+            return cached[1]
+        inflight = self._inflight.get(origin)
+        if inflight is None:
+            inflight = self._inflight[origin] = asyncio.ensure_future(self._load(origin))
+            inflight.add_done_callback(lambda _: self._inflight.pop(origin, None))
+        return await asyncio.shield(inflight)
+
+    async def _load(self, origin: str) -> RobotFileParser:
+        parser = RobotFileParser(origin + "/robots.txt")
+        try:
+            body = await self.fetch(origin + "/robots.txt")
+        except Exception:
+            body = None
+        # No robots.txt (or it could not be fetched) means everything is allowed
+        parser.parse((body or "").splitlines())
+        self._entries[origin] = (time.time() + self.ttl, parser)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return parser
+
+    async def allowed(self, url: str) -> Tuple[bool, Optional[float]]:
+        """Return (allowed, crawl_delay) for a URL"""
+        parts = urlsplit(url)
+        rules = await self._rules(f"{parts.scheme}://{parts.netloc}")
+        delay = rules.crawl_delay(self.user_agent)
+        return rules.can_fetch(self.user_agent, url), float(delay) if delay is not None else None
+
+
+class HostPacer:
+    """Spaces out requests to the same host by at least a politeness delay
+
+    Hosts are only remembered until their next slot has passed, so memory stays bounded by
+    the hosts crawled within the last few delays.
+    """
+
+    def __init__(self, delay: float, max_delay: float):
+        self.delay = delay
+        self.max_delay = max_delay
+        # Least recently reserved first
+        self._next: "OrderedDict[str, float]" = OrderedDict()
+
+    async def wait(self, host: str, delay: Optional[float] = None) -> None:
+        delay = min(max(self.delay, delay or 0.0), self.max_delay)
+        now = time.monotonic()
+        # Reserve the next slot for this host before sleeping, so concurrent waiters queue up
+        ready = max(self._next.pop(host, now), now)
+        self._next[host] = ready + delay
+        # A host whose slot has passed would get `now` anyway: forget it
+        while self._next:
+            oldest, slot = next(iter(self._next.items()))
+            if slot > now:
+                break
+            del self._next[oldest]
+        if ready > now:
+            await asyncio.sleep(ready - now)
+
+
+def normalize_url(url: str) -> Optional[str]:
+    """Crawlable form of a URL (no fragment), or None for non-http(s) links"""
+    url = urldefrag(url.strip())[0]
+    if not url.lower().startswith(("http://", "https://")):
+        return None
+    return url
+
+
+def _bare_host(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class CrawlScope:
+    """Decides whether a discovered URL belongs to the crawl"""
+
+    def __init__(self, kind: str, seeds: List[str], pattern: Optional[Pattern[str]] = None):
+        self.kind = kind
+        self.pattern = pattern
+        self.domains = {_bare_host(seed) for seed in seeds}
+
+    def __contains__(self, url: str) -> bool:
+        if self.kind == "regex":
+            return bool(self.pattern.search(url))
+        host = _bare_host(url)
+        return any(host == domain or host.endswith("." + domain) for domain in self.domains)
+
+
+async def run_crawl(seeds: List[str], fetch_page: PageFetcher, scope: CrawlScope, max_depth: int, max_pages: int,
+                    concurrency: int, pacer: HostPacer, delay: float = 0.0, robots: Optional[RobotsCache] = None,
+                    bloom_error_rate: float = 0.001) -> AsyncIterator[Dict[str, Any]]:
+    """Crawl breadth-first from the seeds, yielding one record per page as it finishes
+
+    At most `max_pages` URLs are ever scheduled, so the frontier and the visited set
+    (a Bloom filter sized for `max_pages`) stay bounded. A final record carries a summary.
+    """
+    frontier: "asyncio.Queue[Tuple[str, int]]" = asyncio.Queue()
+    records: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=concurrency * 2)
+    visited = BloomFilter(max_pages, bloom_error_rate)
+    summary = {"pages": 0, "errors": 0, "blocked": 0, "discovered": 0, "scheduled": 0}
+
+    def schedule(url: str, depth: int) -> None:
+        if summary["scheduled"] >= max_pages or not visited.add(url):
+            return
+        summary["scheduled"] += 1
+        frontier.put_nowait((url, depth))
+
+    async def crawl_one(url: str, depth: int) -> Dict[str, Any]:
+        record: Dict[str, Any] = {"url": url, "depth": depth}
+        crawl_delay = None
+        if robots is not None:
+            allowed, crawl_delay = await robots.allowed(url)
+            if not allowed:
+                summary["blocked"] += 1
+                return {**record, "status": 403, "error": {"message": "Disallowed by robots.txt", "error": "RobotsDisallowed"}}
+        await pacer.wait(urlsplit(url).netloc.lower(), max(delay, crawl_delay or 0.0))
+        try:
+            page = await fetch_page(url)
+        except Exception as exc:
+            summary["errors"] += 1
+            return {**record, **error_record(exc)}
+        summary["pages"] += 1
+        links = page.pop("links", [])
+        if depth < max_depth:
+            for link in links:
+                link = normalize_url(link)
+                if link is not None and link in scope:
+                    summary["discovered"] += 1
+                    schedule(link, depth + 1)
+        return {**record, "status": 200, **page}
+
+    async def worker() -> None:
+        while True:
+            url, depth = await frontier.get()
+            try:
+                await records.put(await crawl_one(url, depth))
+            finally:
+                frontier.task_done()
+
+    async def finish() -> None:
+        await frontier.join()
+        await records.put(None)
+
+    for seed in seeds:
+        seed = normalize_url(seed)
+        if seed is not None:
+            schedule(seed, 0)
+
+    tasks = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    tasks.append(asyncio.ensure_future(finish()))
+    try:
+        while True:
+            record = await records.get()
+            if record is None:
+                break
+            yield record
+        yield {"summary": {**summary, "visited_set_bytes": visited.memory_bytes}}
+    finally:
+        # Client went away or the crawl is complete
+        for task in tasks:
+            task.cancel()
+
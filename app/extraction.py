@@ -0,0 +1,288 @@
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+EXTRACT_TYPES = ("title", "links", "images", "scripts", "text")
+
+# Strings inside these tags are not plain text for BeautifulSoup's get_text()
+STRING_CONTAINER_TAGS = frozenset({"script", "style", "template", "rt", "rp"})
+PRESERVE_WHITESPACE_TAGS = frozenset({"pre", "textarea"})
+
+# Slice size when parsing can stop early; slices end right before a "<"
+EARLY_STOP_SLICE = 64 * 1024
+
+_CSS_URL_PATTERN = re.compile(r"url\(['\"]?([^'\"()]+)['\"]?\)")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_TAG_PATTERN = re.compile(r"<[^>]+>")
+_ENTITY_PATTERN = re.compile(r"&[a-zA-Z0-9#]+;")
+_ASCII_SPACES_PATTERN = re.compile(r"[\x20\x0a\x09\x0c\x0d]+")
+# urljoin strips these or drops empty ";"/"?"/"#" parts, so such hrefs take the slow path
+_URLJOIN_REWRITES_PATTERN = re.compile(r"[\t\r\n;]|/\.|\?#|[?#]$")
+# Plain relative paths like "img/a.png" that urljoin resolves against the base directory
+_PLAIN_RELATIVE_PATTERN = re.compile(r"[A-Za-z0-9_~%-][^:?#;\s\\\x00-\x1f]*")
+
+
+def clean_text(text: str) -> str:
+    """Normalize extracted page text (cleanup similar to Node version)"""
+    text = _WHITESPACE_PATTERN.sub(" ", text).strip()
+    text = _TAG_PATTERN.sub("", text)
+    text = text.replace("\xa0", " ")
+    text = _ENTITY_PATTERN.sub("", text)
+    text = _WHITESPACE_PATTERN.sub(" ", text).strip()
+    text = text.replace("\n", " ").replace("\t", " ").replace("\r", " ")
+    return text
+
+
+class UrlJoiner:
+    """urljoin against one base URL, memoized, with fast paths for plain paths"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        parts = urlsplit(base_url)
+        self._origin = f"{parts.scheme}://{parts.netloc}" if parts.scheme in ("http", "https") and parts.netloc else None
+        self._directory = None
+        if self._origin and ";" not in parts.path and "/." not in parts.path and "//" not in parts.path:
+            self._directory = self._origin + (parts.path[:parts.path.rfind("/") + 1] or "/")
+        self._cache: Dict[str, str] = {}
+
+    def __call__(self, href: str) -> str:
+        joined = self._cache.get(href)
+        if joined is None:
+            if (self._origin and href[:1] == "/" and href[1:2] != "/"
+                    and not _URLJOIN_REWRITES_PATTERN.search(href)):
+                joined = self._origin + href
+            elif (self._directory and _PLAIN_RELATIVE_PATTERN.fullmatch(href)
+                    and "/." not in href and "//" not in href and href != ".."):
+                joined = self._directory + href
+            else:
+                joined = urljoin(self.base_url, href)
+            self._cache[href] = joined
+        return joined
+
+    def link(self, href: str) -> str:
+        if href.startswith(("http://", "https://", "tel:", "mailto:")):
+            return href
+        return self(href)
+
+
+def css_urls(style: str) -> List[str]:
+    return _CSS_URL_PATTERN.findall(style)
+
+
+class PageExtractor:
+    """lxml parser target collecting title, links, images, scripts and text in one pass
+
+    It sees the same parser events BeautifulSoup's lxml builder does and applies the
+    same string rules, so results are identical to the extract_* functions in app.main
+    without building a tree. Feed it from a finished document (extract_page) or from
+    chunks as they download, checking satisfied() to stop early.
+    """
+
+    def __init__(self, types: Iterable[str], base_url: str, limit: Optional[int] = None):
+        self.types = frozenset(types)
+        self.base_url = base_url
+        self.urljoin = UrlJoiner(base_url)
+        self.limit = limit
+        self.title: Optional[str] = None
+        # soup.title is the first <title> anywhere (an inline SVG's too), so only a closed
+        # <title> or the end of the document settles it
+        self.title_settled = False
+        self.links: List[Dict[str, str]] = []
+        self.images: List[Dict[str, str]] = []
+        self.scripts: List[str] = []
+        self._style_images: List[Dict[str, str]] = []
+        self._seen_links: set[str] = set()
+        self._seen_images: set[str] = set()
+        self._seen_style_images: set[str] = set()
+        self._text_pieces: List[str] = []
+        self._data: List[str] = []
+        # Open elements as (tag, text buffer or None)
+        self._stack: List[tuple] = []
+        self._open_counts: Counter = Counter()
+        self._containers: List[str] = []
+        self._preserve_depth = 0
+        self._open_buffers: List[List[str]] = []
+        self._pending_links: Dict[int, Dict[str, str]] = {}
+        self._script_buffer: Optional[List[str]] = None
+        self._title_open = False
+
+    # lxml parser target interface
+
+    def start(self, tag: str, attrib: Dict[str, str], nsmap: Optional[Dict[str, str]] = None) -> None:
+        self._flush()
+        buffer = None
+        if tag == "a":
+            buffer = []
+            href = attrib.get("href")
+            if "links" in self.types and href:
+                absolute = self.urljoin.link(href)
+                if absolute not in self._seen_links:
+                    self._seen_links.add(absolute)
+                    # Text is filled in when the element ends
+                    link = {"url": absolute, "text": ""}
+                    self.links.append(link)
+                    self._pending_links[id(buffer)] = link
+        elif tag == "title" and self.title is None and not self._title_open:
+            buffer = []
+            self._title_open = True
+        elif tag == "script":
+            self._script_buffer = []
+        if "images" in self.types:
+            self._collect_images(tag, attrib)
+
+        self._stack.append((tag, buffer))
+        self._open_counts[tag] += 1
+        if buffer is not None:
+            self._open_buffers.append(buffer)
+        if tag in STRING_CONTAINER_TAGS:
+            self._containers.append(tag)
+        if tag in PRESERVE_WHITESPACE_TAGS:
+            self._preserve_depth += 1
+
+    def end(self, tag: str) -> None:
+        self._flush()
+        if not self._open_counts[tag]:
+            return
+        # Close everything up to the most recent element with this name
+        while self._stack:
+            name, buffer = self._stack.pop()
+            self._close(name, buffer)
+            if name == tag:
+                break
+
+    def data(self, data: str) -> None:
+        self._data.append(data)
+
+    def comment(self, text: str) -> None:
+        self._flush()
+
+    def pi(self, target: str, data: Optional[str] = None) -> None:
+        self._flush()
+
+    def doctype(self, *args: Any) -> None:
+        self._flush()
+
+    def close(self) -> Dict[str, Any]:
+        self._flush()
+        while self._stack:
+            self._close(*self._stack.pop())
+        self.title_settled = True
+        return self.results()
+
+    def _close(self, tag: str, buffer: Optional[List[str]]) -> None:
+        self._open_counts[tag] -= 1
+        if buffer is not None:
+            # Elements close innermost first, so this is the most recent buffer
+            self._open_buffers.pop()
+            text = "".join(buffer).strip()
+            if tag == "title":
+                self.title = text
+                self.title_settled = True
+                self._title_open = False
+            else:
+                link = self._pending_links.pop(id(buffer), None)
+                if link is not None:
+                    link["text"] = text
+        if tag == "script" and self._script_buffer is not None:
+            if "scripts" in self.types:
+                self.scripts.append("".join(self._script_buffer))
+            self._script_buffer = None
+        if self._containers and self._containers[-1] == tag:
+            self._containers.pop()
+        if tag in PRESERVE_WHITESPACE_TAGS:
+            self._preserve_depth -= 1
+
+    def _flush(self) -> None:
+        """End the current string, classifying it the way BeautifulSoup would"""
+        if not self._data:
+            return
+        string = "".join(self._data)
+        self._data = []
+        if not self._preserve_depth and _ASCII_SPACES_PATTERN.fullmatch(string):
+            string = "\n" if "\n" in string else " "
+        if self._containers:
+            if self._containers[-1] == "script" and self._script_buffer is not None:
+                self._script_buffer.append(string)
+            return
+        if "text" in self.types:
+            self._text_pieces.append(string)
+        for buffer in self._open_buffers:
+            buffer.append(string)
+
+    def _collect_images(self, tag: str, attrib: Dict[str, str]) -> None:
+        if tag == "img":
+            src = attrib.get("src")
+            if src:
+                absolute = self.urljoin(src)
+                if absolute not in self._seen_images:
+                    self._seen_images.add(absolute)
+                    self.images.append({"src": absolute})
+        style = attrib.get("style")
+        if style:
+            for match in css_urls(style):
+                absolute = self.urljoin(match)
+                if absolute not in self._seen_style_images:
+                    self._seen_style_images.add(absolute)
+                    self._style_images.append({"src": absolute})
+
+    def satisfied(self) -> bool:
+        """True once the rest of the document cannot change the requested results"""
+        if self.types - {"title", "links", "images"} or not self.title_settled:
+            return False
+        if self.types == {"title"}:
+            return True
+        if self.limit is None or self._open_buffers:
+            return False
+        # <img> sources are listed before inline style URLs, so only they can end the page early
+        return all(len(self.links if kind == "links" else self.images) >= self.limit
+                   for kind in self.types - {"title"})
+
+    def results(self) -> Dict[str, Any]:
+        results: Dict[str, Any] = {"title": self.title or ""}
+        if "links" in self.types:
+            results["links"] = self.links[:self.limit]
+        if "images" in self.types:
+            images = self.images + [item for item in self._style_images if item["src"] not in self._seen_images]
+            results["images"] = images[:self.limit]
+        if "scripts" in self.types:
+            results["scripts"] = "\n".join(self.scripts)
+        if "text" in self.types:
+            results["text"] = clean_text(" ".join(self._text_pieces))
+        return results
+
+
+def load_parser() -> Any:
+    """lxml.etree, imported on first use so that importing the app stays cheap on cold starts"""
+    from lxml import etree
+    return etree
+
+
+def new_parser(extractor: PageExtractor, encoding: Optional[str] = None) -> Any:
+    """HTML parser driving an extractor, configured like BeautifulSoup's lxml builder"""
+    return load_parser().HTMLParser(target=extractor, strip_cdata=False, recover=True, encoding=encoding)
+
+
+def extract_page(html: str, base_url: str, types: Iterable[str], limit: Optional[int] = None) -> Dict[str, Any]:
+    """Extract every requested section from a page in a single parsing pass"""
+    extractor = PageExtractor(types, base_url, limit)
+    if not html:
+        return extractor.results()
+    etree = load_parser()
+    parser = new_parser(extractor)
+    try:
+        if extractor.types <= {"title", "links", "images"} and (extractor.types == {"title"} or limit):
+            # Feed in slices so parsing can stop once the result is complete
+            position = 0
+            while position < len(html):
+                cut = html.find("<", position + EARLY_STOP_SLICE)
+                cut = len(html) if cut == -1 else cut
+                parser.feed(html[position:cut])
+                position = cut
+                if extractor.satisfied():
+                    return extractor.results()
+        else:
+            parser.feed(html)
+        return parser.close()
+    except etree.XMLSyntaxError:
+        return extractor.close()
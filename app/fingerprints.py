@@ -0,0 +1,144 @@
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.responses import dumps
+
+# Types whose results are lists of items and can be answered with added/removed items
+ITEM_TYPES = {"links", "images"}
+FINGERPRINT_TYPES = {"html", "links", "images", "text", "title", "scripts"}
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def content_hash(value: Any) -> str:
+    """Short stable hash of a string (or of a JSON-encodable value)"""
+    data = value.encode("utf-8") if isinstance(value, str) else dumps(value)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """64-bit simhash over word shingles; near-identical texts differ in few bits"""
+    words = _WORD_PATTERN.findall(text.lower())
+    features = {" ".join(words[index:index + shingle]) for index in range(max(1, len(words) - shingle + 1))}
+    # One 64-character bit string per feature; counting '1's column by column keeps the loop in C
+    rows = [format(int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big"), "064b")
+            for feature in features]
+    majority = len(rows) / 2
+    return int("".join("1" if column.count("1") > majority else "0" for column in zip(*rows)) or "0", 2)
+
+
+def hamming(left: int, right: int) -> int:
+    return bin(left ^ right).count("1")
+
+
+class Snapshot:
+    """What a scrape result looked like: enough to recognise it and diff against it"""
+
+    __slots__ = ("url", "content_type", "fingerprint", "page_hash", "items", "simhash", "size")
+
+    def __init__(self, url: str, content_type: str, page_hash: str, value: Any):
+        self.url = url
+        self.content_type = content_type
+        self.page_hash = page_hash
+        self.items: Optional[Dict[str, Any]] = None
+        self.simhash: Optional[int] = None
+        if content_type in ITEM_TYPES:
+            self.items = {content_hash(item): item for item in value}
+            # Item order is ignored: the same set of items is the same result
+            digest = content_hash(sorted(self.items))
+            self.size = sum(len(key) + len(dumps(item)) for key, item in self.items.items())
+        else:
+            digest = page_hash if content_type == "html" else content_hash(value)
+            if content_type == "text":
+                self.simhash = simhash(value)
+            self.size = 64
+        self.fingerprint = content_hash(f"{url}\0{content_type}\0{digest}")
+
+
+class FingerprintStore:
+    """Bounded in-memory LRU of result snapshots, keyed by fingerprint
+
+    Keying by fingerprint (not URL) lets every client diff against the snapshot it last saw,
+    and clients that saw the same content share one snapshot.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self._snapshots: "OrderedDict[str, Snapshot]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"unchanged": 0, "diffs": 0, "full": 0, "unknown_since": 0, "evictions": 0}
+
+    def get(self, fingerprint: str, url: str, content_type: str) -> Optional[Snapshot]:
+        snapshot = self._snapshots.get(fingerprint)
+        if snapshot is None or snapshot.url != url or snapshot.content_type != content_type:
+            return None
+        self._snapshots.move_to_end(fingerprint)
+        return snapshot
+
+    def put(self, snapshot: Snapshot) -> None:
+        old = self._snapshots.pop(snapshot.fingerprint, None)
+        if old is not None:
+            self._bytes -= old.size
+        self._snapshots[snapshot.fingerprint] = snapshot
+        self._bytes += snapshot.size
+        while self._snapshots and (len(self._snapshots) > self.config["max_entries"] or self._bytes > self.config["max_bytes"]):
+            _, evicted = self._snapshots.popitem(last=False)
+            self._bytes -= evicted.size
+            self._stats["evictions"] += 1
+
+    def unchanged_page(self, since: str, url: str, content_type: str, page_hash: str) -> bool:
+        """True if the page is byte-identical to the one `since` was taken from (no parsing needed)"""
+        previous = self.get(since, url, content_type)
+        if previous is None or previous.page_hash != page_hash:
+            return False
+        self._stats["unchanged"] += 1
+        return True
+
+    def compare(self, since: str, current: Snapshot) -> Dict[str, Any]:
+        """Store `current` and describe how it differs from the snapshot `since` names
+
+        `changes` is "none", "diff" (added/removed items) or "full" (send the whole result).
+        """
+        previous = self.get(since, current.url, current.content_type) if since else None
+        self.put(current)
+        if previous is None:
+            if since:
+                self._stats["unknown_since"] += 1
+            self._stats["full"] += 1
+            return {"fingerprint": current.fingerprint, "changes": "full"}
+        if previous.fingerprint == current.fingerprint:
+            # Same result from a different page (e.g. only a timestamp changed): remember the new page
+            previous.page_hash = current.page_hash
+            self._stats["unchanged"] += 1
+            return {"fingerprint": current.fingerprint, "changes": "none"}
+        if current.items is not None and previous.items is not None:
+            self._stats["diffs"] += 1
+            return {
+                "fingerprint": current.fingerprint,
+                "changes": "diff",
+                "added": [item for key, item in current.items.items() if key not in previous.items],
+                "removed": [item for key, item in previous.items.items() if key not in current.items],
+            }
+        self._stats["full"] += 1
+        comparison: Dict[str, Any] = {"fingerprint": current.fingerprint, "changes": "full"}
+        if current.simhash is not None and previous.simhash is not None:
+            distance = hamming(current.simhash, previous.simhash)
+            comparison["simhash_distance"] = distance
+            threshold = self.config["simhash_threshold"]
+            if threshold and distance <= threshold:
+                # Near-duplicate text (e.g. a changed date or counter) counts as unchanged
+                self._stats["full"] -= 1
+                self._stats["unchanged"] += 1
+                comparison["changes"] = "none"
+        return comparison
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "entries": len(self._snapshots),
+            "bytes": self._bytes,
+            "max_entries": self.config["max_entries"],
+            "max_bytes": self.config["max_bytes"],
+        }
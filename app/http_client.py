@@ -0,0 +1,141 @@
+import asyncio
+import importlib.util
+import ssl
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.metrics import record_phase
+
+# httpcore trace events timed as request phases (DNS resolution is part of connect_tcp)
+_TRACED_PHASES = {
+    "connect_tcp": "connect",
+    "start_tls": "tls",
+}
+
+
+class ClientRegistry:
+    """Long-lived httpx clients, one connection pool per proxy configuration"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.http2 = bool(config["http2"]) and importlib.util.find_spec("h2") is not None
+        self._clients: Dict[Tuple[Optional[str], Optional[Tuple[str, str]]], httpx.AsyncClient] = {}
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        # Requests holding or waiting for each host's slot
+        self._host_users: Dict[str, int] = {}
+        self._ssl_context: Optional[ssl.SSLContext] = None
+        self._stats = {
+            "clients_created": 0,
+            "requests": 0,
+            "pool_hits": 0,
+            "pool_misses": 0,
+            "tls_handshakes": 0,
+        }
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.config["max_connections"],
+            max_keepalive_connections=self.config["max_keepalive_connections"],
+            keepalive_expiry=self.config["keepalive_expiry"],
+        )
+
+    def ssl_context(self) -> ssl.SSLContext:
+        """One TLS context (CA bundle loaded once) shared by every client"""
+        if self._ssl_context is None:
+            self._ssl_context = httpx.create_ssl_context(http2=self.http2)
+        return self._ssl_context
+
+    def get_client(self, proxy: Optional[str] = None, auth: Optional[Tuple[str, str]] = None) -> httpx.AsyncClient:
+        """Return the pooled client for a proxy configuration, creating it on first use"""
+        key = (proxy, auth)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                proxy=proxy,
+                auth=auth,
+                verify=self.ssl_context(),
+                timeout=self.config["timeout"],
+                limits=self._limits(),
+                http2=self.http2,
+            )
+            self._clients[key] = client
+            self._stats["clients_created"] += 1
+        return client
+
+    @asynccontextmanager
+    async def host_slot(self, url: str) -> AsyncIterator[None]:
+        """Limit concurrent requests to a single host"""
+        host = urlsplit(url).netloc.lower()
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.config["max_connections_per_host"])
+        self._host_users[host] = self._host_users.get(host, 0) + 1
+        try:
+            async with slot:
+                yield
+        finally:
+            # Forget hosts nobody holds or waits for, so crawls don't grow this without bound
+            self._host_users[host] -= 1
+            if not self._host_users[host]:
+                del self._host_users[host]
+                del self._host_slots[host]
+
+    def trace_extensions(self) -> Dict[str, Any]:
+        """Request extensions that record connection reuse and connect/TLS/first-byte timings"""
+        opened = {"tcp": False}
+        started: Dict[str, float] = {}
+
+        async def trace(event_name: str, info: Dict[str, Any]) -> None:
+            _, _, event = event_name.partition(".")
+            step, _, stage = event.rpartition(".")
+            if step in _TRACED_PHASES or step in ("send_request_headers", "receive_response_headers"):
+                if stage == "started":
+                    started[step] = time.perf_counter()
+                elif stage == "complete" and step in _TRACED_PHASES:
+                    record_phase(_TRACED_PHASES[step], time.perf_counter() - started.pop(step, time.perf_counter()))
+                elif stage == "complete" and step == "receive_response_headers" and "send_request_headers" in started:
+                    # Time to first byte: request sent until response headers received
+                    record_phase("ttfb", time.perf_counter() - started.pop("send_request_headers"))
+            if event_name == "connection.connect_tcp.complete":
+                opened["tcp"] = True
+            elif event_name == "connection.start_tls.complete":
+                self._stats["tls_handshakes"] += 1
+            elif event_name.endswith("send_request_headers.started"):
+                self._stats["requests"] += 1
+                if opened["tcp"]:
+                    self._stats["pool_misses"] += 1
+                else:
+                    self._stats["pool_hits"] += 1
+
+        return {"trace": trace}
+
+    @asynccontextmanager
+    async def stream(self, url: str, proxy: Optional[str] = None, auth: Optional[Tuple[str, str]] = None,
+                     headers: Optional[Dict[str, str]] = None) -> AsyncIterator[httpx.Response]:
+        """GET a URL through the pooled client, yielding the response before its body is read"""
+        client = self.get_client(proxy, auth)
+        async with self.host_slot(url):
+            async with client.stream("GET", url, headers=headers, extensions=self.trace_extensions()) as response:
+                yield response
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self._stats["requests"]
+        return {
+            **self._stats,
+            "open_clients": sum(1 for client in self._clients.values() if not client.is_closed),
+            "hit_ratio": round(self._stats["pool_hits"] / requests, 4) if requests else 0.0,
+            "http2": self.http2,
+            "max_connections": self.config["max_connections"],
+            "max_keepalive_connections": self.config["max_keepalive_connections"],
+            "max_connections_per_host": self.config["max_connections_per_host"],
+            "keepalive_expiry": self.config["keepalive_expiry"],
+        }
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients.clear()
+        await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
@@ -0,0 +1,359 @@
+import asyncio
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.batch import error_record
+
+JOB_STORES = {"sqlite", "memory"}
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("succeeded", "failed")
+
+# run(params) -> result payload
+JobRunner = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def job_key(params: Dict[str, Any]) -> str:
+    """Identity of a job's work, used to deduplicate identical in-flight jobs"""
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {name: value for name, value in job.items() if name != "key"}
+
+
+class JobStore:
+    """Where jobs are kept; implementations must be safe to call from the event loop
+
+    The queue opens the store when it starts and closes it when it stops, so one store
+    can serve several start/stop cycles.
+    """
+
+    async def open(self) -> None:
+        pass
+
+    async def create(self, job: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        raise NotImplementedError
+
+    async def find_active(self, key: str) -> Optional[Dict[str, Any]]:
+        """An unfinished job with this key, if any"""
+        raise NotImplementedError
+
+    async def create_unless_active(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Insert `job` unless an unfinished job with its key exists, atomically
+
+        Returns that existing job instead, or None when `job` was inserted.
+        """
+        raise NotImplementedError
+
+    async def active(self) -> List[Dict[str, Any]]:
+        """Every unfinished job, oldest first (to resume them after a restart)"""
+        raise NotImplementedError
+
+    async def prune(self, before: float) -> int:
+        """Delete finished jobs last updated before `before`; returns how many"""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryJobStore(JobStore):
+    """Process-local store, for tests and single-instance deployments without a disk"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    async def create(self, job: Dict[str, Any]) -> None:
+        self._jobs[job["id"]] = dict(job)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        if job_id in self._jobs:
+            self._jobs[job_id].update(fields)
+
+    async def find_active(self, key: str) -> Optional[Dict[str, Any]]:
+        for job in self._jobs.values():
+            if job["key"] == key and job["status"] in ACTIVE_STATUSES:
+                return dict(job)
+        return None
+
+    async def create_unless_active(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # No await between the check and the insert, so nothing can interleave
+        existing = await self.find_active(job["key"])
+        if existing is None:
+            await self.create(job)
+        return existing
+
+    async def active(self) -> List[Dict[str, Any]]:
+        jobs = [dict(job) for job in self._jobs.values() if job["status"] in ACTIVE_STATUSES]
+        return sorted(jobs, key=lambda job: job["created_at"])
+
+    async def prune(self, before: float) -> int:
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["status"] in FINISHED_STATUSES and job["updated_at"] < before]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+
+class SqliteJobStore(JobStore):
+    """Jobs in a SQLite file, so they outlive the process; queries run in a worker thread"""
+
+    _COLUMNS = ("id", "key", "params", "status", "attempts", "result", "error", "created_at", "updated_at")
+    _JSON_COLUMNS = {"params", "result", "error"}
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    async def open(self) -> None:
+        await asyncio.to_thread(self._connect)
+
+    def _connect(self) -> None:
+        with self._lock:
+            if self._db is None:
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+                self._create_schema()
+
+    def _create_schema(self) -> None:
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, key TEXT NOT NULL, params TEXT NOT NULL, "
+                "status TEXT NOT NULL, attempts INTEGER NOT NULL, result TEXT, error TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_key_status ON jobs (key, status)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status_updated ON jobs (status, updated_at)")
+
+    def _encode(self, name: str, value: Any) -> Any:
+        return json.dumps(value, ensure_ascii=False) if name in self._JSON_COLUMNS and value is not None else value
+
+    def _decode(self, row: Optional[tuple]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(zip(self._COLUMNS, row))
+        for name in self._JSON_COLUMNS:
+            if job[name] is not None:
+                job[name] = json.loads(job[name])
+        return job
+
+    def _execute(self, query: str, args: tuple = (), fetch: str = "") -> Any:
+        with self._lock, self._db:
+            cursor = self._db.execute(query, args)
+            if fetch == "one":
+                return cursor.fetchone()
+            if fetch == "all":
+                return cursor.fetchall()
+            return cursor.rowcount
+
+    async def create(self, job: Dict[str, Any]) -> None:
+        values = tuple(self._encode(name, job.get(name)) for name in self._COLUMNS)
+        await asyncio.to_thread(self._execute, f"INSERT INTO jobs VALUES ({', '.join('?' * len(values))})", values)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = await asyncio.to_thread(self._execute, "SELECT * FROM jobs WHERE id = ?", (job_id,), "one")
+        return self._decode(row)
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        values = tuple(self._encode(name, value) for name, value in fields.items())
+        await asyncio.to_thread(self._execute, f"UPDATE jobs SET {assignments} WHERE id = ?", values + (job_id,))
+
+    async def find_active(self, key: str) -> Optional[Dict[str, Any]]:
+        row = await asyncio.to_thread(
+            self._execute, "SELECT * FROM jobs WHERE key = ? AND status IN (?, ?) LIMIT 1", (key, *ACTIVE_STATUSES), "one"
+        )
+        return self._decode(row)
+
+    def _create_unless_active(self, values: tuple) -> Optional[tuple]:
+        with self._lock, self._db:
+            # Take the write lock before looking, so other processes sharing the file can't
+            # insert the same job between the check and the insert
+            self._db.execute("BEGIN IMMEDIATE")
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE key = ? AND status IN (?, ?) LIMIT 1", (values[1], *ACTIVE_STATUSES)
+            ).fetchone()
+            if row is None:
+                self._db.execute(f"INSERT INTO jobs VALUES ({', '.join('?' * len(values))})", values)
+            return row
+
+    async def create_unless_active(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        values = tuple(self._encode(name, job.get(name)) for name in self._COLUMNS)
+        return self._decode(await asyncio.to_thread(self._create_unless_active, values))
+
+    async def active(self) -> List[Dict[str, Any]]:
+        rows = await asyncio.to_thread(
+            self._execute, "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", ACTIVE_STATUSES, "all"
+        )
+        return [self._decode(row) for row in rows]
+
+    async def prune(self, before: float) -> int:
+        return await asyncio.to_thread(
+            self._execute, "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (*FINISHED_STATUSES, before)
+        )
+
+    async def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def create_job_store(config: Dict[str, Any]) -> JobStore:
+    if config["store"] == "memory":
+        return MemoryJobStore()
+    if config["store"] == "sqlite":
+        return SqliteJobStore(config["db_path"])
+    raise ValueError(f"Invalid job store: {config['store']}")
+
+
+class JobQueue:
+    """Runs submitted jobs on a pool of worker tasks, retrying failures with backoff
+
+    Jobs that are still queued or running when the process starts again (SQLite store)
+    are picked up by the workers on startup.
+    """
+
+    def __init__(self, store: JobStore, run: JobRunner, config: Dict[str, Any]):
+        self.store = store
+        self.run = run
+        self.config = config
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self._retries: Dict[str, asyncio.TimerHandle] = {}
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._stats = {"submitted": 0, "deduplicated": 0, "succeeded": 0, "failed": 0, "retried": 0}
+
+    async def start(self) -> None:
+        await self.store.open()
+        # Queue and events belong to the running event loop, so every start gets new ones
+        self._queue = asyncio.Queue()
+        self._changed = {}
+        for job in await self.store.active():
+            await self.store.update(job["id"], status="queued", updated_at=time.time())
+            self._queue.put_nowait(job["id"])
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.config["workers"])]
+        self._workers.append(asyncio.ensure_future(self._prune_loop()))
+
+    async def stop(self) -> None:
+        for handle in self._retries.values():
+            handle.cancel()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._retries = {}
+        await self.store.close()
+
+    async def submit(self, params: Dict[str, Any]) -> tuple[Dict[str, Any], bool]:
+        """Queue a job, or return the identical job already in flight. Returns (job, deduplicated)"""
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "key": job_key(params),
+            "params": params,
+            "status": "queued",
+            "attempts": 0,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        existing = await self.store.create_unless_active(job)
+        if existing is not None:
+            self._stats["deduplicated"] += 1
+            return public_job(existing), True
+        self._stats["submitted"] += 1
+        self._queue.put_nowait(job["id"])
+        return public_job(job), False
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.store.get(job_id)
+        return public_job(job) if job is not None else None
+
+    async def watch(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the job now and after every change, until it has finished"""
+        while True:
+            changed = self._changed.setdefault(job_id, asyncio.Event())
+            job = await self.get(job_id)
+            if job is None:
+                return
+            yield job
+            if job["status"] in FINISHED_STATUSES:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=self.config["watch_heartbeat"])
+            except asyncio.TimeoutError:
+                pass
+
+    async def _update(self, job_id: str, **fields: Any) -> None:
+        await self.store.update(job_id, updated_at=time.time(), **fields)
+        changed = self._changed.pop(job_id, None)
+        if changed is not None:
+            changed.set()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            job = await self.store.get(job_id)
+            if job is None or job["status"] in FINISHED_STATUSES:
+                continue
+            attempts = job["attempts"] + 1
+            await self._update(job_id, status="running", attempts=attempts)
+            try:
+                result = await asyncio.wait_for(self.run(job["params"]), timeout=self.config["attempt_timeout"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                await self._failed(job_id, attempts, error_record(exc))
+            else:
+                self._stats["succeeded"] += 1
+                await self._update(job_id, status="succeeded", result=result, error=None)
+
+    async def _failed(self, job_id: str, attempts: int, error: Dict[str, Any]) -> None:
+        # Client errors (bad URL, invalid type, not cached) won't get better by retrying
+        retryable = error["status"] >= 500 or error["status"] in (408, 429)
+        if retryable and error["status"] != 504 and attempts < self.config["max_attempts"]:
+            self._stats["retried"] += 1
+            delay = min(self.config["backoff_base"] * 2 ** (attempts - 1), self.config["backoff_max"])
+            delay *= random.uniform(0.5, 1.0)
+            await self._update(job_id, status="queued", error=error)
+            self._retries[job_id] = asyncio.get_running_loop().call_later(delay, self._requeue, job_id)
+            return
+        self._stats["failed"] += 1
+        await self._update(job_id, status="failed", error=error)
+
+    def _requeue(self, job_id: str) -> None:
+        self._retries.pop(job_id, None)
+        self._queue.put_nowait(job_id)
+
+    async def _prune_loop(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.config["retention"], 300))
+            await self.store.prune(time.time() - self.config["retention"])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "store": self.config["store"],
+            "workers": self.config["workers"],
+            "queued": self._queue.qsize(),
+            "waiting_retry": len(self._retries),
+        }
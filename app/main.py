@@ -1,18 +1,48 @@
-from typing import Optional, List, Dict, Any
+from typing import TYPE_CHECKING, Optional, List, Dict, Any, Awaitable, Callable, Tuple, Union
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel, TypeAdapter, ValidationError
 import httpx
-from bs4 import BeautifulSoup
 import re
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlsplit
 import os
 import asyncio
+import codecs
+import json
+import tempfile
+import time
+
+from app.batch import ndjson_lines, run_batch
+from app.cache import CACHE_MODES, CacheEntry, CacheMiss, FetchCache
+from app.crawl import CRAWL_SCOPES, CrawlScope, HostPacer, RobotsCache, run_crawl
+from app.extraction import EXTRACT_TYPES, clean_text, css_urls, load_parser
+from app.fingerprints import FINGERPRINT_TYPES, FingerprintStore, Snapshot, content_hash
+from app.http_client import ClientRegistry
+from app.jobs import JobQueue, create_job_store
+from app.metrics import RequestTimer, ScrapeMetrics, phase, record_bytes
+from app.parse_pool import ParseExecutor, ParseSaturated
+from app.proxy_pool import PROXY_FAILURE_STATUSES, ProxyPool, ProxyRoute, parse_proxy_list
+from app.responses import RESPONSE_FORMATS, CompressionMiddleware, FastJSONResponse, dumps, ndjson_items
+from app.schema_extraction import SelectorError, validate_fields
+from app.static_pages import preload_pages
+from app.streaming import ChunkBuffer, IncrementalExtractor, feed_body, json_escape, pump_body, read_body
+
+if TYPE_CHECKING:
+    # Only the legacy extract_* helpers take soups; bs4 is never imported at runtime
+    from bs4 import BeautifulSoup
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PUBLIC_DIR = os.path.join(os.path.dirname(BASE_DIR), "public")
 
+# Startup: "eager" opens connection pools and imports the HTML parser during startup,
+# "lazy" (the default on Vercel) leaves both to the first request that needs them
+STARTUP_CONFIG = {
+    "mode": os.getenv("STARTUP_MODE", "lazy" if os.getenv("VERCEL") else "eager").lower()
+}
+
 # Proxy Configuration
 PROXY_CONFIG = {
     "enabled": os.getenv("USE_PROXY", "false").lower() == "true",
@@ -25,7 +55,145 @@ PROXY_CONFIG = {
     "timeout": int(os.getenv("PROXY_TIMEOUT", "30"))
 }
 
-app = FastAPI(title="Web Scraper API (Python)")
+# Proxy pool: health scoring, circuit breakers and hedged requests
+PROXY_POOL_CONFIG = {
+    "proxy_list": os.getenv("PROXY_LIST", ""),
+    "failure_threshold": int(os.getenv("PROXY_FAILURE_THRESHOLD", "3")),
+    "cooldown": float(os.getenv("PROXY_COOLDOWN", "30")),
+    "ewma_alpha": 0.2,
+    "window": 100,
+    "min_samples": 5,
+    "max_hosts": 256,
+    "hedge_enabled": os.getenv("HEDGE_ENABLED", "true").lower() == "true",
+    "hedge_default_delay": float(os.getenv("HEDGE_DEFAULT_DELAY", "2")),
+    "hedge_min_delay": float(os.getenv("HEDGE_MIN_DELAY", "0.1")),
+    "hedge_max_parallel": int(os.getenv("HEDGE_MAX_PARALLEL", "2"))
+}
+
+# Connection pool configuration (shared by all outgoing requests)
+HTTP_POOL_CONFIG = {
+    "max_connections": int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+    "max_keepalive_connections": int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")),
+    "max_connections_per_host": int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10")),
+    "keepalive_expiry": float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+    "http2": os.getenv("HTTP2_ENABLED", "false").lower() == "true",
+    "timeout": PROXY_CONFIG["timeout"]
+}
+
+http_clients = ClientRegistry(HTTP_POOL_CONFIG)
+
+# Fetch cache configuration (memory LRU + optional compressed disk tier)
+CACHE_CONFIG = {
+    "enabled": os.getenv("CACHE_ENABLED", "true").lower() == "true",
+    "memory_max_bytes": int(os.getenv("CACHE_MEMORY_MAX_BYTES", str(64 * 1024 * 1024))),
+    "disk_dir": os.getenv("CACHE_DIR", ""),
+    "disk_max_bytes": int(os.getenv("CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024))),
+    "default_ttl": float(os.getenv("CACHE_DEFAULT_TTL", "60")),
+    "max_ttl": float(os.getenv("CACHE_MAX_TTL", "3600"))
+}
+
+fetch_cache = FetchCache(CACHE_CONFIG)
+
+SCRAPE_TYPES = {"html", *EXTRACT_TYPES}
+
+# Response body limits (applied while streaming, before anything is parsed)
+STREAM_CONFIG = {
+    "max_body_bytes": int(os.getenv("MAX_BODY_BYTES", str(10 * 1024 * 1024))),
+    "queue_chunks": int(os.getenv("STREAM_QUEUE_CHUNKS", "16"))
+}
+
+# Parse executor: where HTML parsing and extraction run (inline, thread or process)
+PARSE_CONFIG = {
+    "mode": os.getenv("PARSE_EXECUTOR", "thread").lower(),
+    "workers": int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    "inline_max_bytes": int(os.getenv("PARSE_INLINE_MAX_BYTES", str(64 * 1024))),
+    "max_pending": int(os.getenv("PARSE_MAX_PENDING", "64")),
+    "queue_timeout": float(os.getenv("PARSE_QUEUE_TIMEOUT", "5"))
+}
+
+parse_executor = ParseExecutor(PARSE_CONFIG)
+
+# Selector schemas (POST /extract and /scrape?schema=...)
+EXTRACT_CONFIG = {
+    "max_fields": int(os.getenv("EXTRACT_MAX_FIELDS", "100"))
+}
+
+# Batch scraping limits
+BATCH_CONFIG = {
+    "max_items": int(os.getenv("BATCH_MAX_ITEMS", "5000")),
+    "max_concurrency": int(os.getenv("BATCH_MAX_CONCURRENCY", "32")),
+    "max_per_host": int(os.getenv("BATCH_MAX_PER_HOST", "4")),
+    "item_timeout": int(os.getenv("BATCH_ITEM_TIMEOUT", "25"))
+}
+
+# Crawl limits (POST /crawl)
+CRAWL_CONFIG = {
+    "max_pages": int(os.getenv("CRAWL_MAX_PAGES", "10000")),
+    "max_depth": int(os.getenv("CRAWL_MAX_DEPTH", "5")),
+    "max_concurrency": int(os.getenv("CRAWL_MAX_CONCURRENCY", "8")),
+    "page_timeout": int(os.getenv("CRAWL_PAGE_TIMEOUT", "25")),
+    "delay": float(os.getenv("CRAWL_DELAY", "1")),
+    "max_delay": float(os.getenv("CRAWL_MAX_DELAY", "10")),
+    "user_agent": os.getenv("CRAWL_USER_AGENT", "*"),
+    "robots_ttl": float(os.getenv("CRAWL_ROBOTS_TTL", "3600")),
+    "bloom_error_rate": float(os.getenv("CRAWL_BLOOM_ERROR_RATE", "0.001"))
+}
+
+# Job queue (POST /jobs): store, worker pool and retry policy
+JOBS_CONFIG = {
+    "store": os.getenv("JOBS_STORE", "sqlite").lower(),
+    "db_path": os.getenv("JOBS_DB_PATH") or os.path.join(tempfile.gettempdir(), "scraper-jobs.sqlite3"),
+    "workers": int(os.getenv("JOBS_WORKERS", "4")),
+    "max_attempts": int(os.getenv("JOBS_MAX_ATTEMPTS", "3")),
+    "backoff_base": float(os.getenv("JOBS_BACKOFF_BASE", "2")),
+    "backoff_max": float(os.getenv("JOBS_BACKOFF_MAX", "60")),
+    "attempt_timeout": float(os.getenv("JOBS_ATTEMPT_TIMEOUT", "25")),
+    "retention": float(os.getenv("JOBS_RETENTION", "86400")),
+    "watch_heartbeat": 15.0
+}
+
+# Metrics: requests slower than SLOW_REQUEST_MS are logged with their phase breakdown (0 = off)
+METRICS_CONFIG = {
+    "slow_request_ms": float(os.getenv("SLOW_REQUEST_MS", "0"))
+}
+
+scrape_metrics = ScrapeMetrics(METRICS_CONFIG)
+
+# Change detection (since=<fingerprint>): bounded in-memory snapshot store
+FINGERPRINT_CONFIG = {
+    "max_entries": int(os.getenv("FINGERPRINT_MAX_ENTRIES", "20000")),
+    "max_bytes": int(os.getenv("FINGERPRINT_MAX_BYTES", str(64 * 1024 * 1024))),
+    # Texts whose simhashes differ in at most this many bits count as unchanged (0 = exact only)
+    "simhash_threshold": int(os.getenv("FINGERPRINT_SIMHASH_THRESHOLD", "0"))
+}
+
+fingerprint_store = FingerprintStore(FINGERPRINT_CONFIG)
+
+# Response compression, negotiated via Accept-Encoding (brotli only if the package is installed)
+COMPRESSION_CONFIG = {
+    "enabled": os.getenv("COMPRESSION_ENABLED", "true").lower() == "true",
+    "min_bytes": int(os.getenv("COMPRESSION_MIN_BYTES", "1024")),
+    "gzip_level": int(os.getenv("GZIP_LEVEL", "6")),
+    "brotli": os.getenv("BROTLI_ENABLED", "true").lower() == "true",
+    "brotli_quality": int(os.getenv("BROTLI_QUALITY", "4"))
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the pools for the configured routes up front, close every pool on shutdown
+    if STARTUP_CONFIG["mode"] == "eager":
+        for route in proxy_pool.routes:
+            http_clients.get_client(route.proxy, route.auth)
+        await asyncio.to_thread(load_parser)
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await http_clients.aclose()
+    parse_executor.shutdown()
+
+
+app = FastAPI(title="Web Scraper API (Python)", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Global exception handler to catch all unhandled exceptions
 @app.exception_handler(Exception)
@@ -47,59 +215,99 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Cache", "X-Proxy-Used", "X-Truncated", "X-Next-Cursor", "ETag"],
 )
+app.add_middleware(CompressionMiddleware, config=COMPRESSION_CONFIG)
 
 # Serve /public if needed
 if os.path.isdir(PUBLIC_DIR):
     app.mount("/public", StaticFiles(directory=PUBLIC_DIR), name="public")
 
+# Served from memory with ETags instead of being re-read on every request
+static_pages = preload_pages(PUBLIC_DIR, ("index.html", "demo.html"))
+
 
 def get_connection_status() -> str:
     """Get safe connection status without exposing IP"""
     return "Protected"
 
 
-async def make_proxy_request(url: str) -> Dict[str, Any]:
-    """Make a request through configured proxy if enabled, otherwise direct access"""
-    
-    # If custom proxy is configured and enabled
+def get_proxy_settings() -> tuple[Optional[str], Optional[tuple]]:
+    """Resolve the proxy URL and auth for the current configuration"""
+    proxy = None
+    auth = None
     if PROXY_CONFIG["enabled"] and PROXY_CONFIG["proxy_url"]:
-        try:
-            proxies = {
-                "http": f"{PROXY_CONFIG['proxy_type']}://{PROXY_CONFIG['proxy_url']}",
-                "https": f"{PROXY_CONFIG['proxy_type']}://{PROXY_CONFIG['proxy_url']}"
-            }
-            
-            # Add authentication if provided
-            auth = None
-            if PROXY_CONFIG["proxy_auth"]["username"] and PROXY_CONFIG["proxy_auth"]["password"]:
-                auth = (PROXY_CONFIG["proxy_auth"]["username"], PROXY_CONFIG["proxy_auth"]["password"])
-            
-            async with httpx.AsyncClient(
-                proxies=proxies, 
-                auth=auth, 
-                timeout=PROXY_CONFIG["timeout"]
-            ) as client:
-                response = await client.get(url)
-                return {
-                    "status": response.status_code,
-                    "content": response.text if response.status_code == 200 else "Failed",
-                    "proxy_used": f"Custom: {PROXY_CONFIG['proxy_url']}"
-                }
-        except Exception as e:
-            return {"status": "Error", "content": str(e), "proxy_used": f"Custom: {PROXY_CONFIG['proxy_url']}"}
-    
-    # If no proxy configured or disabled, use direct access
+        proxy = f"{PROXY_CONFIG['proxy_type']}://{PROXY_CONFIG['proxy_url']}"
+        # Add authentication if provided
+        if PROXY_CONFIG["proxy_auth"]["username"] and PROXY_CONFIG["proxy_auth"]["password"]:
+            auth = (PROXY_CONFIG["proxy_auth"]["username"], PROXY_CONFIG["proxy_auth"]["password"])
+    return proxy, auth
+
+
+def build_proxy_routes() -> List[ProxyRoute]:
+    """PROXY_LIST if set, otherwise the single configured proxy, otherwise direct access"""
+    routes = parse_proxy_list(PROXY_POOL_CONFIG["proxy_list"], PROXY_CONFIG["proxy_type"])
+    if routes:
+        return routes
+    proxy, auth = get_proxy_settings()
+    if proxy:
+        return [ProxyRoute(proxy, proxy, auth, f"Custom: {PROXY_CONFIG['proxy_url']}")]
+    return [ProxyRoute("direct", None, None, "Direct access (no proxy configured)")]
+
+
+proxy_pool = ProxyPool(build_proxy_routes(), PROXY_POOL_CONFIG)
+
+
+BodyConsumer = Callable[[httpx.Response], Awaitable[Tuple[str, bool]]]
+
+
+async def make_proxy_request(url: str, headers: Optional[Dict[str, str]] = None,
+                             consume: Optional[BodyConsumer] = None,
+                             route: Optional[ProxyRoute] = None) -> Dict[str, Any]:
+    """Make a request through a proxy route (the pool's best one by default)
+
+    The body of a 200 response is streamed into `consume` (default: read up to
+    MAX_BODY_BYTES and decode), which returns the content and whether it was truncated.
+    The time until the response headers arrive is recorded in the route's health score.
+    """
+    host = urlsplit(url).netloc.lower()
+    if route is None:
+        route = proxy_pool.choose(host)
+    proxy_used = route.label
+    started = time.perf_counter()
+    answered = False
+
     try:
-        async with httpx.AsyncClient(timeout=PROXY_CONFIG["timeout"]) as client:
-            response = await client.get(url)
+        async with http_clients.stream(url, route.proxy, route.auth, headers) as response:
+            answered = True
+            proxy_pool.record(route, host, time.perf_counter() - started, response.status_code not in PROXY_FAILURE_STATUSES)
+            content, truncated = "Failed", False
+            if response.status_code == 200:
+                with phase("download"):
+                    if consume is None:
+                        content, truncated = await read_body(response, STREAM_CONFIG["max_body_bytes"])
+                    else:
+                        content, truncated = await consume(response)
+                record_bytes("downloaded", response.num_bytes_downloaded)
             return {
                 "status": response.status_code,
-                "content": response.text if response.status_code == 200 else "Failed",
-                "proxy_used": "Direct access (no proxy configured)"
+                "content": content,
+                "truncated": truncated,
+                "headers": dict(response.headers),
+                "proxy_used": proxy_used
             }
+    except asyncio.CancelledError:
+        elapsed = time.perf_counter() - started
+        if not answered and elapsed > proxy_pool.hedge_delay(host):
+            # Cancelled (lost a hedge race or timed out) after waiting longer than a healthy
+            # route takes: count it as a failure. Earlier cancellations say nothing about the
+            # route, so they neither reset its breaker nor add a latency sample.
+            proxy_pool.record(route, host, elapsed, False)
+        raise
     except Exception as e:
-        return {"status": "Error", "content": str(e), "proxy_used": "Direct access (failed)"}
+        if not answered:
+            proxy_pool.record(route, host, time.perf_counter() - started, False)
+        return {"status": "Error", "content": str(e), "proxy_used": proxy_used if route.proxy else "Direct access (failed)"}
 
 
 async def fetch_html(url: str) -> str:
@@ -122,33 +330,240 @@ async def fetch_html(url: str) -> str:
         raise httpx.HTTPError(f"Failed to fetch URL: {url}. All proxy options failed: {proxy_result.get('content', 'Unknown error')}")
 
 
-async def fetch_html_with_tracking(url: str) -> tuple[str, dict]:
-    """Fetch HTML content with proxy usage tracking - NO DIRECT ACCESS"""
-    
-    # Skip direct access entirely - always use proxy system for IP protection
-    proxy_result = await make_proxy_request(url)
-    
-    if proxy_result["status"] == 200:
-        return proxy_result["content"], {
-            "proxy_used": proxy_result.get("proxy_used", "Unknown proxy"),
-            "ip_used": f"Proxy IP ({proxy_result.get('proxy_used', 'Unknown')}) - 🛡️ Protected"
-        }
-    else:
-        # Try fallback to http if https fails (still through proxy)
-        if url.lower().startswith("https://"):
-            fallback_url = "http://" + url[8:]
-            fallback_proxy_result = await make_proxy_request(fallback_url)
-            if fallback_proxy_result["status"] == 200:
-                return fallback_proxy_result["content"], {
-                    "proxy_used": fallback_proxy_result.get("proxy_used", "Unknown proxy"),
-                    "ip_used": f"Proxy IP ({fallback_proxy_result.get('proxy_used', 'Unknown')}) - 🛡️ Protected"
-                }
-        
-        # If all else fails, raise an error
-        raise httpx.HTTPError(f"Failed to fetch URL: {url}. All proxy options failed: {proxy_result.get('content', 'Unknown error')}")
+async def fetch_with_fallback(url: str, headers: Optional[Dict[str, str]] = None,
+                              consume: Optional[BodyConsumer] = None) -> Dict[str, Any]:
+    """Fetch a URL through the proxy pool, falling back to http if https fails
+
+    Attempts run in order: the best route, the other healthy routes by score, then http
+    through the best route. A failed attempt starts the next one right away; with hedging enabled, an
+    attempt that hasn't answered within the host's observed p95 gets a parallel backup.
+    The first attempt to receive a 200 response claims the body, the others are cancelled.
+    """
+    # A 304 only counts as success when we sent validators for a cached copy
+    ok_statuses = (200, 304) if headers else (200,)
+    host = urlsplit(url).netloc.lower()
+    best = proxy_pool.choose(host)
+    attempts: List[Tuple[str, ProxyRoute]] = [(url, best)]
+    tried = [best]
+    while True:
+        backup = proxy_pool.choose(host, exclude=tried, allow_open=False)
+        if backup is None:
+            break
+        attempts.append((url, backup))
+        tried.append(backup)
+    # Try fallback to http if https fails (still through proxy)
+    if url.lower().startswith("https://"):
+        attempts.append(("http://" + url[8:], best))
+
+    tasks: List[asyncio.Task] = []
+    running: set = set()
+    claimed: List[int] = []
+    failures: List[Dict[str, Any]] = []
+    hedged = False
+
+    def claim(index: int) -> BodyConsumer:
+        async def consume_once(response: httpx.Response) -> Tuple[str, bool]:
+            if claimed and claimed[0] != index:
+                raise RuntimeError("Another attempt answered first")
+            claimed.append(index)
+            for other, task in enumerate(tasks):
+                if other != index:
+                    task.cancel()
+            if consume is None:
+                return await read_body(response, STREAM_CONFIG["max_body_bytes"])
+            return await consume(response)
+        return consume_once
+
+    def launch() -> None:
+        target, route = attempts[len(tasks)]
+        task = asyncio.ensure_future(make_proxy_request(target, headers, claim(len(tasks)), route))
+        tasks.append(task)
+        running.add(task)
+
+    launch()
+    try:
+        while running:
+            hedge = (PROXY_POOL_CONFIG["hedge_enabled"] and not claimed and len(tasks) < len(attempts)
+                     and len(running) < PROXY_POOL_CONFIG["hedge_max_parallel"])
+            done, _ = await asyncio.wait(running, timeout=proxy_pool.hedge_delay(host) if hedge else None,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Slow first answer: race a backup attempt against it
+                hedged = True
+                launch()
+                continue
+            for task in done:
+                running.discard(task)
+                if task.cancelled():
+                    continue
+                result = task.result()
+                if result["status"] in ok_statuses:
+                    if hedged:
+                        proxy_pool.count_hedge(tasks.index(task) > 0)
+                    return result
+                failures.append(result)
+            # Replace failed attempts, keeping up to the hedge width in flight once hedging started
+            if not claimed and len(tasks) < len(attempts) and (not running or (
+                    hedged and len(running) < PROXY_POOL_CONFIG["hedge_max_parallel"])):
+                launch()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    # If all else fails, raise an error
+    first_error = failures[0].get("content", "Unknown error") if failures else "Unknown error"
+    raise httpx.HTTPError(f"Failed to fetch URL: {url}. All proxy options failed: {first_error}")
+
+
+async def fetch_html_with_tracking(url: str, cache_mode: str = "prefer") -> tuple[str, dict]:
+    """Fetch HTML content with proxy usage tracking, served through the fetch cache - NO DIRECT ACCESS"""
+    with phase("fetch"):
+        entry, cache_status = await fetch_cache.fetch(url, fetch_with_fallback, cache_mode)
+    return entry.content, entry_info(entry, cache_status)
+
+
+def entry_info(entry: CacheEntry, cache_status: str) -> dict:
+    return {
+        "proxy_used": entry.proxy_used,
+        "ip_used": f"Proxy IP ({entry.proxy_used}) - 🛡️ Protected",
+        "cache": cache_status,
+        "truncated": entry.truncated
+    }
+
+
+# Early-stopping fetches in flight, keyed by (url, type, limit); their results can't be cached
+partial_fetches: Dict[Tuple[str, str, Optional[int]], "asyncio.Future[Tuple[IncrementalExtractor, dict]]"] = {}
+
+
+async def fetch_partial_with_tracking(url: str, content_type: str, limit: Optional[int],
+                                      cache_mode: str = "prefer") -> tuple[IncrementalExtractor, dict]:
+    """Stream a page into an incremental parser, stopping as soon as `content_type` is satisfied
+
+    Identical requests running at the same time share one fetch (except with cache=bypass).
+    """
+    if cache_mode == "bypass":
+        return await _fetch_partial(url, content_type, limit)
+    key = (url, content_type, limit)
+    inflight = partial_fetches.get(key)
+    if inflight is not None:
+        extractor, info = await asyncio.shield(inflight)
+        return extractor, {**info, "cache": "coalesced"}
+    task = partial_fetches[key] = asyncio.ensure_future(_fetch_partial(url, content_type, limit))
+
+    def finish(done: asyncio.Future) -> None:
+        partial_fetches.pop(key, None)
+        # Mark the exception as retrieved even if every waiter went away
+        if not done.cancelled():
+            done.exception()
+
+    task.add_done_callback(finish)
+    return await asyncio.shield(task)
+
+
+async def _fetch_partial(url: str, content_type: str, limit: Optional[int]) -> tuple[IncrementalExtractor, dict]:
+    extractors: List[IncrementalExtractor] = []
+
+    async def consume(response: httpx.Response) -> Tuple[str, bool]:
+        extractor = IncrementalExtractor(content_type, url, limit, response.encoding or "utf-8")
+        extractors.append(extractor)
+        return "", await feed_body(response, extractor, STREAM_CONFIG["max_body_bytes"])
+
+    result = await fetch_with_fallback(url, consume=consume)
+    return extractors[-1], {
+        "proxy_used": result["proxy_used"],
+        "ip_used": f"Proxy IP ({result['proxy_used']}) - 🛡️ Protected",
+        "cache": "miss",
+        "truncated": result["truncated"]
+    }
+
+
+async def stream_html_response(url: str, cache_mode: str,
+                               raw: bool = False) -> Union[StreamingResponse, Tuple[str, dict]]:
+    """Pass the page through as a streamed JSON envelope (or as-is with `raw`) instead of buffering it
+
+    The fetch runs through the fetch cache, so a stale copy is revalidated, concurrent
+    requests for the URL share one fetch and a complete body is stored. When the cache
+    answers without a new body (not modified, another request's fetch, a fresh copy on
+    disk) the (html, proxy info) pair is returned instead of a stream.
+
+    The body is only held in memory when the cache will store it or other requests joined
+    the fetch. Until someone joins, a slow client slows the download down.
+    """
+    chunks = ChunkBuffer(STREAM_CONFIG["queue_chunks"], PROXY_CONFIG["timeout"])
+    started = asyncio.get_running_loop().create_future()
+
+    async def consume(response: httpx.Response) -> Tuple[str, bool]:
+        if started.done():
+            # A body was already forwarded; never splice a second attempt into the stream
+            return "", True
+        started.set_result(response.encoding or "utf-8")
+        keep = fetch_cache.storable(response.headers)
+        # Joining requests need the whole body, and must not wait on this client
+        if fetch_cache.on_join(url, chunks.release):
+            if chunks.released:
+                keep = True
+            elif not keep:
+                # Nothing will be stored, so later requests fetch for themselves
+                fetch_cache.detach(url)
+        return await pump_body(response, chunks, STREAM_CONFIG["max_body_bytes"], keep)
+
+    async def load(target: str, validators: Dict[str, str]) -> Dict[str, Any]:
+        result = await fetch_with_fallback(target, validators or None, consume=consume)
+        if result["truncated"]:
+            # Cut off by the size cap or a dropped connection: passed through, not cached
+            result["cacheable"] = False
+        return result
+
+    fetch = asyncio.ensure_future(fetch_cache.fetch(url, load, cache_mode))
+    await asyncio.wait({fetch, started}, return_when=asyncio.FIRST_COMPLETED)
+    if not started.done():
+        # Answered from the cache, or every attempt failed before a body arrived (raises)
+        started.cancel()
+        entry, cache_status = fetch.result()
+        return entry.content, entry_info(entry, cache_status)
+    encoding = started.result()
+    cache_status = "bypass" if cache_mode == "bypass" else "miss"
+
+    async def passthrough():
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                yield chunk
+            # Wait until the cache has stored the body
+            await fetch
+        finally:
+            # A fetch that other requests joined keeps running for them
+            chunks.release()
+            fetch.cancel()
+
+    if raw:
+        return StreamingResponse(passthrough(), media_type=f"text/html; charset={encoding}", headers={"X-Cache": cache_status})
+
+    async def envelope():
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        title = IncrementalExtractor("title", url, encoding=encoding)
+        try:
+            yield b'{"message":"Raw HTML","result":"'
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                title.feed(chunk)
+                yield json_escape(decoder.decode(chunk))
+            yield json_escape(decoder.decode(b"", final=True))
+            title.close()
+            entry, _ = await fetch
+            yield b'",' + dumps({"pageTitle": title.title or "", **entry_info(entry, cache_status)})[1:]
+        finally:
+            chunks.release()
+            fetch.cancel()
+
+    return StreamingResponse(envelope(), media_type="application/json")
 
 
-def extract_images(soup: BeautifulSoup, base_url: str) -> List[Dict[str, str]]:
+def extract_images(soup: "BeautifulSoup", base_url: str) -> List[Dict[str, str]]:
     images: List[Dict[str, str]] = []
 
     # <img src="...">
@@ -158,10 +573,9 @@ def extract_images(soup: BeautifulSoup, base_url: str) -> List[Dict[str, str]]:
             images.append({"src": urljoin(base_url, src)})
 
     # CSS inline background images: style="background-image:url('...')"
-    url_pattern = re.compile(r"url\(['\"]?([^'\"()]+)['\"]?\)")
     for element in soup.find_all(style=True):
         style_value = element.get("style", "")
-        for match in url_pattern.findall(style_value):
+        for match in css_urls(style_value):
             images.append({"src": urljoin(base_url, match)})
 
     # Deduplicate by src
@@ -175,22 +589,15 @@ def extract_images(soup: BeautifulSoup, base_url: str) -> List[Dict[str, str]]:
     return unique
 
 
-def extract_text(soup: BeautifulSoup) -> str:
+def extract_text(soup: "BeautifulSoup") -> str:
     # Remove script and style
     for tag in soup(["script", "style"]):
         tag.decompose()
-    text = soup.get_text(separator=" ")
-    # Cleanup similar to Node version
-    text = re.sub(r"\s+", " ", text).strip()
-    text = re.sub(r"<[^>]+>", "", text)
-    text = text.replace("\xa0", " ")
-    text = re.sub(r"&[a-zA-Z0-9#]+;", "", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    text = text.replace("\n", " ").replace("\t", " ").replace("\r", " ")
-    return text
-
-
-def extract_links(soup: BeautifulSoup, base_url: str) -> List[Dict[str, str]]:
+    # Cleanup similar to Node version (shared with the extraction engine)
+    return clean_text(soup.get_text(separator=" "))
+
+
+def extract_links(soup: "BeautifulSoup", base_url: str) -> List[Dict[str, str]]:
     links: List[Dict[str, str]] = []
     for a in soup.find_all("a"):
         href = a.get("href")
@@ -212,7 +619,7 @@ def extract_links(soup: BeautifulSoup, base_url: str) -> List[Dict[str, str]]:
     return unique
 
 
-def extract_scripts(soup: BeautifulSoup) -> str:
+def extract_scripts(soup: "BeautifulSoup") -> str:
     scripts_content: List[str] = []
     for script in soup.find_all("script"):
         # Safely extract script content
@@ -226,11 +633,14 @@ def extract_scripts(soup: BeautifulSoup) -> str:
     return "\n".join(scripts_content)
 
 
-async def scrape_with_timeout(url: str, content_type: Optional[str] = None, timeout: int = 45) -> Dict[str, Any]:
+async def scrape_with_timeout(url: str, content_type: Optional[str] = None, timeout: int = 45, cache_mode: str = "prefer",
+                              limit: Optional[int] = None, allow_stream: bool = False, output: str = "json",
+                              cursor: Optional[int] = None, since: Optional[str] = None,
+                              fields: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
     """Wrapper function to add timeout to scraping operation"""
     try:
         return await asyncio.wait_for(
-            _scrape_website(url, content_type), 
+            _scrape_website(url, content_type, cache_mode, limit, allow_stream, output, cursor, since, fields), 
             timeout=timeout
         )
     except asyncio.TimeoutError:
@@ -245,13 +655,62 @@ async def scrape_with_timeout(url: str, content_type: Optional[str] = None, time
         )
 
 
-async def _scrape_website(url: str, content_type: Optional[str] = None) -> Dict[str, Any]:
-    """Internal scraping function without timeout wrapper"""
+def paginate(items: List[Any], cursor: Optional[int], limit: Optional[int]) -> Tuple[List[Any], Optional[int]]:
+    """One page of a list result (`items` holds at least one item past the page if there are more)"""
+    start = cursor or 0
+    if limit is None:
+        return items[start:], None
+    return items[start:start + limit], start + limit if len(items) > start + limit else None
+
+
+def validate_scrape_options(content_type: Optional[str], cache_mode: str, limit: Optional[int]) -> List[str]:
+    """Check type, cache and limit (shared by /scrape and /jobs); returns the requested types"""
+    # One type or a comma-separated combination (e.g. links,images,text)
+    requested = list(dict.fromkeys(part.strip() for part in (content_type or "html").split(",")))
+    if any(part not in SCRAPE_TYPES for part in requested):
+        raise HTTPException(status_code=400, detail={"message": "Invalid method. Please use one or more (comma-separated) of the following: html, images, text, links, scripts, title"})
+    if cache_mode not in CACHE_MODES:
+        raise HTTPException(status_code=400, detail={"message": "Invalid cache mode. Please use one of the following: bypass, prefer, only"})
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail={"message": "Invalid limit. Please use a positive integer"})
+    return requested
+
+
+async def _scrape_website(url: str, content_type: Optional[str] = None, cache_mode: str = "prefer",
+                          limit: Optional[int] = None, allow_stream: bool = False, output: str = "json",
+                          cursor: Optional[int] = None, since: Optional[str] = None,
+                          fields: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Internal scraping function without timeout wrapper
+
+    With `allow_stream`, pages that are not freshly cached are streamed: `html` is passed
+    through as it arrives and `title` (or `links`/`images` with a limit) stop reading early.
+    `cursor` pages through `links`/`images` with `limit` items per page; only the items up
+    to the end of the page (plus one, to know whether there is a next page) are extracted.
+    With `since` (a fingerprint from an earlier response, or "" to start), an unchanged result
+    comes back as `changes: "none"` without a result, and links/images as the added/removed items.
+    `fields` (a selector schema, see app.schema_extraction) replaces `type`: the result is
+    one value per field.
+    """
     
     if not url:
         raise HTTPException(status_code=400, detail={"message": "Please provide a valid URL as a query parameter (e.g., ?url=https://example.com)"})
-    if content_type and content_type not in {"html", "images", "text", "links", "scripts"}:
-        raise HTTPException(status_code=400, detail={"message": "Invalid method. Please use one of the following: html, images, text, links, scripts"})
+    if fields is not None and (content_type or output != "json" or since is not None or limit is not None or cursor is not None):
+        raise HTTPException(status_code=400, detail={"message": "A schema can't be combined with type, format, since, limit or cursor"})
+    requested = validate_scrape_options(content_type, cache_mode, limit)
+    content_type = requested[0] if len(requested) == 1 else None
+    if output not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail={"message": "Invalid format. Please use one of the following: json, raw, ndjson"})
+    if output == "raw" and content_type not in {"html", "text", "title", "scripts"}:
+        raise HTTPException(status_code=400, detail={"message": "format=raw supports a single type of html, text, title or scripts. Use format=ndjson for links and images"})
+    if output == "ndjson" and content_type not in {"links", "images"}:
+        raise HTTPException(status_code=400, detail={"message": "format=ndjson supports a single type of links or images"})
+    if cursor is not None and (cursor < 0 or content_type not in {"links", "images"}):
+        raise HTTPException(status_code=400, detail={"message": "Invalid cursor. Please use a non-negative cursor with type=links or type=images"})
+    if since is not None and (content_type not in FINGERPRINT_TYPES or output != "json" or limit is not None or cursor is not None):
+        raise HTTPException(status_code=400, detail={"message": "since supports a single type of html, images, text, links, scripts or title, without limit, cursor or format"})
+    paged = content_type in {"links", "images"} and (cursor is not None or limit is not None)
+    # Extract one item past the requested page so we know whether another page follows
+    extract_limit = (cursor or 0) + limit + 1 if paged and limit is not None else limit
 
     # Ensure scheme
     if not url.lower().startswith(("http://", "https://")):
@@ -260,42 +719,125 @@ async def _scrape_website(url: str, content_type: Optional[str] = None) -> Dict[
     try:
         # Track proxy usage and response details
         proxy_info = {"proxy_used": "Direct connection", "ip_used": "Not tracked"}
-        
+
+        html: Optional[str] = None
+        # Stream instead of buffering when the cache can't answer right away
+        if content_type and allow_stream and since is None and fields is None and cache_mode != "only" and (cache_mode == "bypass" or fetch_cache.peek(url) is None):
+            if content_type == "html":
+                streamed = await stream_html_response(url, cache_mode, raw=output == "raw")
+                if isinstance(streamed, StreamingResponse):
+                    return streamed
+                html, proxy_info = streamed
+            elif (content_type == "title" or (content_type in {"links", "images"} and limit)) and (
+                    cache_mode == "bypass" or not await fetch_cache.known(url)):
+                # Partial bodies aren't cached, so a stored copy to revalidate or a running fetch to join wins
+                extractor, proxy_info = await fetch_partial_with_tracking(url, content_type, extract_limit, cache_mode)
+                base_response = {
+                    "message": "Success",
+                    "pageTitle": extractor.title or "",
+                    "proxy_used": proxy_info["proxy_used"],
+                    "ip_used": proxy_info["ip_used"],
+                    "cache": proxy_info["cache"],
+                    "truncated": proxy_info["truncated"]
+                }
+                if content_type == "title":
+                    return {**base_response, "message": "Title", "result": extractor.title or ""}
+                items, next_cursor = paginate(extractor.results(), cursor, limit)
+                if content_type == "images":
+                    return {**base_response, "message": "Images", "result": items, "next_cursor": next_cursor}
+                return {**base_response, "message": "Links extracted successfully", "result": items, "next_cursor": next_cursor}
+
         # Fetch HTML with proxy tracking
-        html, proxy_info = await fetch_html_with_tracking(url)
-        soup = BeautifulSoup(html, "lxml")
-        
-        # Safely extract page title - handle cases where title might be a string
-        page_title = ""
-        if soup.title:
-            if hasattr(soup.title, 'string') and callable(getattr(soup.title, 'string', None)):
-                page_title = (soup.title.string or "").strip()
-            elif hasattr(soup.title, 'get_text'):
-                page_title = soup.title.get_text().strip()
-            else:
-                page_title = str(soup.title).strip()
+        if html is None:
+            html, proxy_info = await fetch_html_with_tracking(url, cache_mode)
+        if fields is not None:
+            with phase("parse"):
+                values = await parse_executor.extract_fields(html, url, fields)
+            return {
+                "message": "Fields extracted",
+                "result": values,
+                "proxy_used": proxy_info["proxy_used"],
+                "cache": proxy_info["cache"],
+                "truncated": proxy_info["truncated"]
+            }
+        if since is not None:
+            page_hash = content_hash(html)
+            # A byte-identical page can't have changed: skip parsing altogether
+            if since and fingerprint_store.unchanged_page(since, url, content_type, page_hash):
+                return {
+                    "message": "Unchanged",
+                    "fingerprint": since,
+                    "changes": "none",
+                    "proxy_used": proxy_info["proxy_used"],
+                    "ip_used": proxy_info["ip_used"],
+                    "cache": proxy_info["cache"],
+                    "truncated": proxy_info["truncated"]
+                }
+        # Title plus every requested section in a single parsing pass
+        with phase("parse"):
+            page = await parse_executor.extract(html, url, [part for part in requested if part != "html"] or ["title"], extract_limit)
 
         # Base response with proxy info
         base_response = {
             "message": "Success",
-            "pageTitle": page_title,
+            "pageTitle": page["title"],
             "proxy_used": proxy_info["proxy_used"],
-            "ip_used": proxy_info["ip_used"]
+            "ip_used": proxy_info["ip_used"],
+            "cache": proxy_info["cache"],
+            "truncated": proxy_info["truncated"]
         }
 
-        if content_type == "html":
-            return {**base_response, "message": "Raw HTML", "result": html}
+        if since is not None:
+            value = html if content_type == "html" else page[content_type]
+            snapshot = await asyncio.to_thread(Snapshot, url, content_type, page_hash, value)
+            comparison = fingerprint_store.compare(since, snapshot)
+            if comparison["changes"] == "none":
+                return {**base_response, "message": "Unchanged", **comparison}
+            if comparison["changes"] == "diff":
+                return {**base_response, "message": "Changed", **comparison}
+            base_response = {**base_response, **comparison}
+
+        if content_type is None:
+            result = {part: html if part == "html" else page[part] for part in requested}
+            return {**base_response, "message": "Extracted: " + ", ".join(requested), "result": result}
+        if content_type == "title":
+            return {**base_response, "message": "Title", "result": page["title"]}
+        if paged:
+            items, next_cursor = paginate(page[content_type], cursor, limit)
+            message = "Images" if content_type == "images" else "Links extracted successfully"
+            return {**base_response, "message": message, "result": items, "next_cursor": next_cursor}
         if content_type == "images":
-            return {**base_response, "message": "Images", "result": extract_images(soup, url)}
+            return {**base_response, "message": "Images", "result": page["images"]}
         if content_type == "text":
-            return {**base_response, "message": "Text", "result": extract_text(soup)}
+            return {**base_response, "message": "Text", "result": page["text"]}
         if content_type == "links":
-            return {**base_response, "message": "Links extracted successfully", "result": extract_links(soup, url)}
+            return {**base_response, "message": "Links extracted successfully", "result": page["links"]}
         if content_type == "scripts":
-            return {**base_response, "message": "Scripts extracted successfully", "result": extract_scripts(soup)}
+            return {**base_response, "message": "Scripts extracted successfully", "result": page["scripts"]}
 
         # Default to raw HTML
         return {**base_response, "message": "Raw HTML", "result": html}
+    except CacheMiss as e:
+        raise HTTPException(status_code=504, detail={
+            "message": "URL is not in the cache (cache=only)",
+            "error": str(e),
+            "url": url,
+            "error_type": type(e).__name__
+        })
+    except ParseSaturated as e:
+        raise HTTPException(status_code=503, headers={"Retry-After": "1"}, detail={
+            "message": "The server is busy parsing other pages. Please retry shortly",
+            "error": str(e),
+            "url": url,
+            "error_type": type(e).__name__
+        })
+    except SelectorError as e:
+        raise HTTPException(status_code=400, detail={
+            "message": "Invalid schema",
+            "error": str(e),
+            "url": url,
+            "error_type": type(e).__name__
+        })
     except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail={
             "message": "Error fetching the website", 
@@ -312,19 +854,350 @@ async def _scrape_website(url: str, content_type: Optional[str] = None) -> Dict[
         })
 
 
+def scrape_timer(content_type: Optional[str]) -> RequestTimer:
+    """Timer for a scrape, labelled with its type (combinations share one label)"""
+    if not content_type:
+        label = "html"
+    elif content_type in SCRAPE_TYPES:
+        label = content_type
+    else:
+        label = "multi" if all(part.strip() in SCRAPE_TYPES for part in content_type.split(",")) else "invalid"
+    return RequestTimer(label)
+
+
+async def timed_scrape(timer: RequestTimer, url: Optional[str], scrape: Awaitable[Any]) -> Any:
+    """Await a scrape with `timer` as the current request timer, recording failures in the metrics
+
+    Callers record successful scrapes themselves, once the response is complete.
+    """
+    with timer:
+        try:
+            return await scrape
+        except HTTPException as e:
+            proxy = e.detail.get("proxy_used", "none") if isinstance(e.detail, dict) else "none"
+            scrape_metrics.observe(timer, e.status_code, proxy, url)
+            e.headers = {**(e.headers or {}), "Server-Timing": timer.server_timing()}
+            raise
+
+
+def result_headers(result: Dict[str, Any]) -> Dict[str, str]:
+    """Scrape metadata as response headers, for formats whose body is the result alone"""
+    headers = {
+        "X-Cache": str(result.get("cache", "")),
+        "X-Proxy-Used": str(result.get("proxy_used", "")).encode("ascii", "replace").decode("ascii"),
+        "X-Truncated": "true" if result.get("truncated") else "false",
+    }
+    if result.get("next_cursor") is not None:
+        headers["X-Next-Cursor"] = str(result["next_cursor"])
+    if result.get("fingerprint"):
+        headers["ETag"] = f'"{result["fingerprint"]}"'
+    return headers
+
+
+class ExtractField(BaseModel):
+    css: Optional[str] = None
+    xpath: Optional[str] = None
+    # Attribute to read; the element's text when unset
+    attr: Optional[str] = None
+    # Every match as a list instead of the first one
+    many: bool = False
+
+
+schema_adapter = TypeAdapter(Dict[str, ExtractField])
+
+
+def parse_schema(fields: Dict[str, ExtractField]) -> Dict[str, Dict[str, Any]]:
+    """The schema as plain dicts, with every selector compiled (and cached) up front"""
+    if len(fields) > EXTRACT_CONFIG["max_fields"]:
+        raise HTTPException(status_code=400, detail={"message": f"Too many fields. A schema may contain at most {EXTRACT_CONFIG['max_fields']} fields"})
+    schema = {name: field.model_dump() for name, field in fields.items()}
+    try:
+        validate_fields(schema)
+    except SelectorError as e:
+        raise HTTPException(status_code=400, detail={"message": "Invalid schema", "error": str(e), "error_type": type(e).__name__})
+    return schema
+
+
 @app.get("/scrape")
-async def scrape(url: Optional[str] = None, type: Optional[str] = None):
-    """Scrape website with timeout protection"""
-    return await scrape_with_timeout(url, type)
+async def scrape(request: Request, url: Optional[str] = None, type: Optional[str] = None, cache: str = "prefer",
+                 limit: Optional[int] = None, format: str = "json", cursor: Optional[int] = None, since: Optional[str] = None,
+                 schema: Optional[str] = None):
+    """Scrape website with timeout protection
+
+    `format=raw` returns html/text/title/scripts as the response body, `format=ndjson` streams
+    links/images one per line; scrape metadata moves to X-* headers for both.
+    An unchanged result for `since` (or If-None-Match) is answered with an empty 304.
+    `schema` (JSON, as the `fields` of POST /extract) returns selected values instead of a type.
+    """
+    fields = None
+    if schema is not None:
+        try:
+            fields = parse_schema(schema_adapter.validate_json(schema))
+        except ValidationError as e:
+            # `type` is the query parameter here
+            raise HTTPException(status_code=400, detail={"message": "Invalid schema", "error": str(e), "error_type": e.__class__.__name__})
+    fingerprintable = (type or "html").strip() in FINGERPRINT_TYPES and format == "json" and limit is None and cursor is None
+    if since is None and fingerprintable and "if-none-match" in request.headers:
+        since = request.headers["if-none-match"].removeprefix("W/").strip('"')
+    timer = RequestTimer("fields") if fields is not None else scrape_timer(type)
+    result = await timed_scrape(timer, url, scrape_with_timeout(url, type, cache_mode=cache, limit=limit, allow_stream=True,
+                                                                output=format, cursor=cursor, since=since, fields=fields))
+    if isinstance(result, StreamingResponse):
+        # Passed through as it arrives: only the phases up to the response headers are known
+        response, proxy = result, "streamed"
+    elif result.get("changes") == "none":
+        response = Response(status_code=304, headers=result_headers(result))
+        proxy = result.get("proxy_used", "none")
+    elif format == "ndjson":
+        response = StreamingResponse(ndjson_items(result["result"]), media_type="application/x-ndjson",
+                                     headers=result_headers(result))
+        proxy = result.get("proxy_used", "none")
+    else:
+        with timer.phase("serialize"):
+            if format == "raw":
+                media_type = "text/html; charset=utf-8" if (type or "html").strip() == "html" else "text/plain; charset=utf-8"
+                response = Response(result["result"], media_type=media_type, headers=result_headers(result))
+            else:
+                response = FastJSONResponse(result, headers=result_headers(result) if result.get("fingerprint") else None)
+        timer.add_bytes("sent", len(response.body))
+        proxy = result.get("proxy_used", "none")
+    response.headers["Server-Timing"] = timer.server_timing()
+    scrape_metrics.observe(timer, response.status_code, proxy, url)
+    return response
+
+
+class ExtractRequest(BaseModel):
+    fields: Dict[str, ExtractField]
+    url: Optional[str] = None
+    # Already fetched page to extract from instead of `url`; `base_url` resolves its links
+    html: Optional[str] = None
+    base_url: Optional[str] = None
+    cache: str = "prefer"
+
+
+@app.post("/extract")
+async def extract(request: ExtractRequest):
+    """Evaluate a schema of CSS/XPath fields against a URL (fetched like /scrape) or posted HTML"""
+    if bool(request.url) == (request.html is not None):
+        raise HTTPException(status_code=400, detail={"message": "Please provide either a url or html"})
+    fields = parse_schema(request.fields)
+    timer = RequestTimer("fields")
+    if request.url:
+        result = await timed_scrape(timer, request.url, scrape_with_timeout(request.url, cache_mode=request.cache, fields=fields))
+    else:
+        if len(request.html) > STREAM_CONFIG["max_body_bytes"]:
+            raise HTTPException(status_code=413, detail={"message": f"HTML too large. At most {STREAM_CONFIG['max_body_bytes']} bytes can be extracted from"})
+
+        async def extract_posted() -> Dict[str, Any]:
+            try:
+                with phase("parse"):
+                    values = await parse_executor.extract_fields(request.html, request.base_url, fields)
+            except ParseSaturated as e:
+                raise HTTPException(status_code=503, headers={"Retry-After": "1"}, detail={
+                    "message": "The server is busy parsing other pages. Please retry shortly",
+                    "error": str(e),
+                    "error_type": type(e).__name__
+                })
+            except SelectorError as e:
+                raise HTTPException(status_code=400, detail={"message": "Invalid schema", "error": str(e), "error_type": type(e).__name__})
+            return {"message": "Fields extracted", "result": values}
+
+        result = await timed_scrape(timer, request.base_url, extract_posted())
+    with timer.phase("serialize"):
+        response = FastJSONResponse(result)
+    timer.add_bytes("sent", len(response.body))
+    response.headers["Server-Timing"] = timer.server_timing()
+    scrape_metrics.observe(timer, 200, result.get("proxy_used", "none"), request.url or request.base_url)
+    return response
+
+
+class BatchItem(BaseModel):
+    url: str
+    type: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    concurrency: Optional[int] = None
+    per_host: Optional[int] = None
+    timeout: Optional[int] = None
+    cache: str = "prefer"
+
+
+@app.post("/scrape/batch")
+async def scrape_batch(batch: BatchRequest):
+    """Scrape many URLs concurrently, streaming NDJSON results in completion order"""
+    if not batch.items:
+        raise HTTPException(status_code=400, detail={"message": "Please provide at least one item to scrape"})
+    if len(batch.items) > BATCH_CONFIG["max_items"]:
+        raise HTTPException(status_code=400, detail={"message": f"Too many items. A batch may contain at most {BATCH_CONFIG['max_items']} items"})
+
+    concurrency = max(1, min(batch.concurrency or BATCH_CONFIG["max_concurrency"], BATCH_CONFIG["max_concurrency"]))
+    per_host = max(1, min(batch.per_host or BATCH_CONFIG["max_per_host"], concurrency))
+    timeout = max(1, min(batch.timeout or BATCH_CONFIG["item_timeout"], BATCH_CONFIG["item_timeout"]))
+
+    async def scrape_item(url: str, content_type: Optional[str]) -> Dict[str, Any]:
+        timer = scrape_timer(content_type)
+        result = await timed_scrape(timer, url, scrape_with_timeout(url, content_type, timeout=timeout, cache_mode=batch.cache))
+        scrape_metrics.observe(timer, 200, result.get("proxy_used", "none"), url)
+        return result
+
+    records = run_batch([item.model_dump() for item in batch.items], scrape_item, concurrency, per_host)
+    return StreamingResponse(ndjson_lines(records), media_type="application/x-ndjson")
+
+
+async def run_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a queued scrape; the job queue applies its own per-attempt timeout"""
+    timer = scrape_timer(params["type"])
+    result = await timed_scrape(timer, params["url"], _scrape_website(params["url"], params["type"], params["cache"], params["limit"]))
+    scrape_metrics.observe(timer, 200, result.get("proxy_used", "none"), params["url"])
+    return result
+
+
+job_queue = JobQueue(create_job_store(JOBS_CONFIG), run_job, JOBS_CONFIG)
+
+
+class JobRequest(BaseModel):
+    url: str
+    type: Optional[str] = None
+    cache: str = "prefer"
+    limit: Optional[int] = None
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: JobRequest):
+    """Queue a scrape and return its id right away; an identical job in flight is reused"""
+    if not request.url:
+        raise HTTPException(status_code=400, detail={"message": "Please provide a valid URL to scrape"})
+    # Reject bad options now rather than as a failed job after the client starts polling
+    validate_scrape_options(request.type, request.cache, request.limit)
+    job, deduplicated = await job_queue.submit(request.model_dump())
+    return {
+        "message": "Job already in progress" if deduplicated else "Job queued",
+        "id": job["id"],
+        "status": job["status"],
+        "deduplicated": deduplicated,
+        "poll": f"/jobs/{job['id']}"
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request, stream: bool = False):
+    """Job status and result; with ?stream=true (or Accept: text/event-stream) as server-sent events"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail={"message": "Job not found", "id": job_id})
+    if not stream and "text/event-stream" not in request.headers.get("accept", ""):
+        return job
+
+    async def events():
+        async for update in job_queue.watch(job_id):
+            yield f"event: {update['status']}\ndata: {json.dumps(update, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: scrape latency histograms, per-phase timings, bytes and component stats"""
+    body = scrape_metrics.render({
+        "cache": fetch_cache.stats(),
+        "connection_pool": http_clients.stats(),
+        "parse": parse_executor.stats(),
+        "jobs": job_queue.stats(),
+        "fingerprints": fingerprint_store.stats(),
+        "proxy_pool": {key: value for key, value in proxy_pool.stats().items() if key != "routes"},
+    })
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/job-stats")
+async def get_job_stats():
+    """Get job queue counters"""
+    return job_queue.stats()
+
+
+async def fetch_robots(robots_url: str) -> Optional[str]:
+    """robots.txt body for the crawler, or None when the site has none"""
+    try:
+        result = await fetch_with_fallback(robots_url)
+    except httpx.HTTPError:
+        return None
+    return result["content"]
+
+
+robots_cache = RobotsCache(fetch_robots, CRAWL_CONFIG["user_agent"], CRAWL_CONFIG["robots_ttl"])
+host_pacer = HostPacer(CRAWL_CONFIG["delay"], CRAWL_CONFIG["max_delay"])
+
+
+class CrawlRequest(BaseModel):
+    seeds: List[str]
+    max_depth: int = 2
+    max_pages: int = 100
+    scope: str = "domain"
+    pattern: Optional[str] = None
+    types: List[str] = ["title"]
+    concurrency: Optional[int] = None
+    delay: Optional[float] = None
+    respect_robots: bool = True
+    cache: str = "prefer"
+
+
+@app.post("/crawl")
+async def crawl(request: CrawlRequest):
+    """Crawl from seed URLs server-side, streaming one NDJSON record per page as it finishes"""
+    if not request.seeds:
+        raise HTTPException(status_code=400, detail={"message": "Please provide at least one seed URL"})
+    if any(part not in EXTRACT_TYPES for part in request.types):
+        raise HTTPException(status_code=400, detail={"message": "Invalid types. Please use any of the following: images, text, links, scripts, title"})
+    if request.scope not in CRAWL_SCOPES:
+        raise HTTPException(status_code=400, detail={"message": "Invalid scope. Please use one of the following: domain, regex"})
+    if request.cache not in CACHE_MODES:
+        raise HTTPException(status_code=400, detail={"message": "Invalid cache mode. Please use one of the following: bypass, prefer, only"})
+    pattern = None
+    if request.scope == "regex":
+        if not request.pattern:
+            raise HTTPException(status_code=400, detail={"message": "Please provide a pattern for scope=regex"})
+        try:
+            pattern = re.compile(request.pattern)
+        except re.error as e:
+            raise HTTPException(status_code=400, detail={"message": "Invalid scope pattern", "error": str(e)})
+
+    seeds = [seed if seed.lower().startswith(("http://", "https://")) else "https://" + seed for seed in request.seeds]
+    max_depth = max(0, min(request.max_depth, CRAWL_CONFIG["max_depth"]))
+    max_pages = max(1, min(request.max_pages, CRAWL_CONFIG["max_pages"]))
+    concurrency = max(1, min(request.concurrency or CRAWL_CONFIG["max_concurrency"], CRAWL_CONFIG["max_concurrency"]))
+    types = list(dict.fromkeys(request.types))
+
+    async def fetch_page(url: str) -> Dict[str, Any]:
+        async def load() -> Dict[str, Any]:
+            html, proxy_info = await fetch_html_with_tracking(url, request.cache)
+            # Links are always extracted: they feed the frontier
+            page = await parse_executor.extract(html, url, types + ["links"])
+            return {
+                "pageTitle": page["title"],
+                "result": {part: page[part] for part in types},
+                "links": [link["url"] for link in page["links"]],
+                "proxy_used": proxy_info["proxy_used"],
+                "cache": proxy_info["cache"],
+                "truncated": proxy_info["truncated"]
+            }
+        return await asyncio.wait_for(load(), timeout=CRAWL_CONFIG["page_timeout"])
+
+    records = run_crawl(
+        seeds, fetch_page, CrawlScope(request.scope, seeds, pattern), max_depth, max_pages, concurrency,
+        host_pacer, delay=request.delay or 0.0, robots=robots_cache if request.respect_robots else None,
+        bloom_error_rate=CRAWL_CONFIG["bloom_error_rate"]
+    )
+    return StreamingResponse(ndjson_lines(records), media_type="application/x-ndjson")
 
 
 @app.get("/demo")
-async def demo():
-    index_path = os.path.join(PUBLIC_DIR, "demo.html")
-    if not os.path.exists(index_path):
+async def demo(request: Request):
+    page = static_pages["demo.html"]
+    if page is None:
         return HTMLResponse(content="<h1>Demo file not found</h1>", status_code=404)
-    with open(index_path, "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    return page.response(request)
 
 
 @app.get("/api/proxy-config")
@@ -336,11 +1209,30 @@ async def get_proxy_config():
         "proxy_type": PROXY_CONFIG["proxy_type"],
         "timeout": PROXY_CONFIG["timeout"],
         "has_auth": bool(PROXY_CONFIG["proxy_auth"]["username"] and PROXY_CONFIG["proxy_auth"]["password"]),
+        "connection_pool": http_clients.stats(),
         "status": "🛡️ Proxy Status: " + ("Enabled" if PROXY_CONFIG["enabled"] else "Disabled - Using Direct Access"),
         "instructions": "Set environment variables to configure proxy. See env.template for examples."
     }
 
 
+@app.get("/api/cache-stats")
+async def get_cache_stats():
+    """Get fetch cache hit/miss and size counters"""
+    return fetch_cache.stats()
+
+
+@app.get("/api/fingerprint-stats")
+async def get_fingerprint_stats():
+    """Get change-detection snapshot store counters"""
+    return fingerprint_store.stats()
+
+
+@app.get("/api/parse-stats")
+async def get_parse_stats():
+    """Get parse executor mode, queue depth and offload counters"""
+    return parse_executor.stats()
+
+
 @app.get("/api/test-proxy")
 async def test_proxy():
     """Test the proxy system with a simple URL"""
@@ -354,6 +1246,7 @@ async def test_proxy():
             "message": "Proxy test completed",
             "test_url": test_url,
             "result": result,
+            "proxy_pool": proxy_pool.stats(),
             "system_status": "🛡️ Simplified Proxy System: Proxy if enabled, Direct access if disabled"
         }
     except Exception as e:
@@ -365,9 +1258,8 @@ async def test_proxy():
 
 
 @app.get("/")
-async def root():
-    index_path = os.path.join(PUBLIC_DIR, "index.html")
-    if not os.path.exists(index_path):
+async def root(request: Request):
+    page = static_pages["index.html"]
+    if page is None:
         return HTMLResponse(content="<h1>Web Scraper API</h1>")
-    with open(index_path, "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    return page.response(request)
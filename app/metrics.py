@@ -0,0 +1,194 @@
+import json
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Seconds; covers cache hits (ms) up to scrapes that hit the request timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+slow_log = logging.getLogger("scraper.slow_requests")
+
+_current_timer: "ContextVar[Optional[RequestTimer]]" = ContextVar("request_timer", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labels, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # Per label set: [bucket counts..., sum, count]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in self._series.items():
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                bucket = _labels(self.labels, key, 'le="%g"' % bound)
+                lines.append(f"{self.name}_bucket{bucket} {_number(cumulative)}")
+            bucket = _labels(self.labels, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket} {_number(series[-1])}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {_number(series[-1])}")
+        return lines
+
+
+class RequestTimer:
+    """Phase durations and byte counts for one scrape, shared with everything it awaits
+
+    Entering the timer makes it current for the running context; tasks started inside
+    (hedged fetch attempts, wait_for) inherit it, so their phases are summed in.
+    """
+
+    def __init__(self, content_type: str):
+        self.content_type = content_type
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.bytes: Dict[str, int] = {}
+        self._token = None
+
+    def __enter__(self) -> "RequestTimer":
+        self._token = _current_timer.set(self)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        _current_timer.reset(self._token)
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_bytes(self, kind: str, amount: int) -> None:
+        self.bytes[kind] = self.bytes.get(kind, 0) + amount
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Server-Timing header value (milliseconds)"""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        entries.append(f"total;dur={self.elapsed * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def record_phase(name: str, seconds: float) -> None:
+    """Add time to a phase of the current request, if one is being timed"""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+def record_bytes(kind: str, amount: int) -> None:
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add_bytes(kind, amount)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a block as a phase of the current request, if one is being timed"""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    with timer.phase(name):
+        yield
+
+
+class ScrapeMetrics:
+    """Request/phase histograms and byte counters, rendered in Prometheus text format"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.requests = Histogram("scraper_request_duration_seconds", "Scrape duration by type, proxy and status",
+                                  ("type", "proxy", "status"))
+        self.phases = Histogram("scraper_phase_duration_seconds", "Time spent per scrape phase", ("phase", "type"))
+        self.bytes = Counter("scraper_bytes_total", "Bytes downloaded from origins and sent to clients", ("kind", "type"))
+
+    def observe(self, timer: RequestTimer, status: int, proxy: str, url: Optional[str] = None) -> None:
+        elapsed = timer.elapsed
+        self.requests.observe(elapsed, type=timer.content_type, proxy=proxy, status=str(status))
+        for name, seconds in timer.phases.items():
+            self.phases.observe(seconds, phase=name, type=timer.content_type)
+        for kind, amount in timer.bytes.items():
+            self.bytes.inc(amount, kind=kind, type=timer.content_type)
+        threshold = self.config["slow_request_ms"]
+        if threshold and elapsed * 1000 >= threshold:
+            slow_log.warning("slow scrape %s", json.dumps({
+                "url": url,
+                "type": timer.content_type,
+                "status": status,
+                "proxy": proxy,
+                "total_ms": round(elapsed * 1000, 1),
+                "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in timer.phases.items()},
+                "bytes": timer.bytes,
+            }, ensure_ascii=False))
+
+    def render(self, gauges: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+        """Prometheus exposition text; `gauges` adds numeric stats as scraper_<group>_<name>"""
+        lines = self.requests.render() + self.phases.render() + self.bytes.render()
+        for group, values in (gauges or {}).items():
+            for name, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                metric = f"scraper_{group}_{name}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {_number(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,103 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from app.extraction import extract_page
+from app.schema_extraction import extract_fields
+
+PARSE_MODES = {"inline", "thread", "process"}
+
+
+class ParseSaturated(Exception):
+    """Raised when every parse worker is busy and the wait queue is full"""
+
+
+class ParseExecutor:
+    """Runs extract_page inline, in a thread pool or in a process pool
+
+    Small pages are always parsed inline since handing them to a worker costs more
+    than parsing them. Larger pages go to the pool so the event loop keeps serving
+    other requests. At most `max_pending` pages wait for or occupy a worker; further
+    requests wait up to `queue_timeout` seconds for a slot before ParseSaturated.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        if config["mode"] not in PARSE_MODES:
+            raise ValueError(f"Invalid parse executor mode: {config['mode']}")
+        self.config = config
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        self._stats = {"inline": 0, "offloaded": 0, "rejected": 0, "worker_restarts": 0}
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.config["mode"] == "process":
+                # Spawned workers only import the extraction modules, not the web app
+                self._executor = ProcessPoolExecutor(self.config["workers"], mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._executor = ThreadPoolExecutor(self.config["workers"], thread_name_prefix="parse")
+        return self._executor
+
+    async def extract(self, html: str, base_url: str, types: Iterable[str], limit: Optional[int] = None) -> Dict[str, Any]:
+        """Extract the requested sections from a page (see app.extraction.extract_page)"""
+        return await self._run(extract_page, html, base_url, list(types), limit)
+
+    async def extract_fields(self, html: str, base_url: Optional[str], fields: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Evaluate a selector schema against a page (see app.schema_extraction.extract_fields)"""
+        return await self._run(extract_fields, html, base_url, fields)
+
+    async def _run(self, func: Callable[..., Dict[str, Any]], html: str, *args: Any) -> Dict[str, Any]:
+        if self.config["mode"] == "inline" or len(html) < self.config["inline_max_bytes"]:
+            self._stats["inline"] += 1
+            return func(html, *args)
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.config["max_pending"])
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.config["queue_timeout"])
+        except asyncio.TimeoutError:
+            self._stats["rejected"] += 1
+            raise ParseSaturated(f"All {self.config['max_pending']} parse slots are busy")
+
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            future = executor.submit(func, html, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._pending += 1
+        self._stats["offloaded"] += 1
+        # Hold the slot until the worker is done, even if the request was cancelled meanwhile
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool for later requests
+            if self._executor is executor:
+                self._executor = None
+                self._stats["worker_restarts"] += 1
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def _release(self) -> None:
+        self._pending -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "mode": self.config["mode"],
+            "workers": self.config["workers"],
+            "inline_max_bytes": self.config["inline_max_bytes"],
+            "pending": self._pending,
+            "max_pending": self.config["max_pending"],
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
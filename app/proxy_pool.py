@@ -0,0 +1,232 @@
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+# Statuses that point at the proxy rather than the target site
+PROXY_FAILURE_STATUSES = {407, 502, 503, 504}
+
+
+class ProxyRoute:
+    """One way out: a proxy (or direct access) with the client settings it needs"""
+
+    __slots__ = ("name", "proxy", "auth", "label")
+
+    def __init__(self, name: str, proxy: Optional[str], auth: Optional[Tuple[str, str]], label: str):
+        self.name = name
+        self.proxy = proxy
+        self.auth = auth
+        self.label = label
+
+
+def parse_proxy_list(value: str, default_type: str = "http") -> List[ProxyRoute]:
+    """Parse PROXY_LIST: comma-separated `[type://][user:pass@]host:port` entries"""
+    routes: List[ProxyRoute] = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        if "://" not in entry:
+            entry = f"{default_type}://{entry}"
+        parts = urlsplit(entry)
+        host = parts.hostname or ""
+        address = f"{host}:{parts.port}" if parts.port else host
+        # Credentials stay in the proxy URL, the name shown in stats never includes them
+        name = urlunsplit((parts.scheme, address, "", "", ""))
+        routes.append(ProxyRoute(name, entry, None, f"Custom: {address}"))
+    return routes
+
+
+class RollingStats:
+    """Exponentially weighted latency and error rate plus a window of recent latencies"""
+
+    __slots__ = ("alpha", "latency", "error_rate", "samples", "requests", "failures", "last_used")
+
+    def __init__(self, alpha: float, window: int):
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples: deque = deque(maxlen=window)
+        self.requests = 0
+        self.failures = 0
+        self.last_used = 0.0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.requests += 1
+        self.last_used = time.time()
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if not ok:
+            self.failures += 1
+            return
+        self.samples.append(latency)
+        self.latency = latency if self.latency is None else self.latency + self.alpha * (latency - self.latency)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        p95 = self.percentile(0.95)
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "error_rate": round(self.error_rate, 4),
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class RouteState:
+    """Scores and circuit breaker for one route"""
+
+    def __init__(self, route: ProxyRoute, config: Dict[str, Any]):
+        self.route = route
+        self.config = config
+        self.overall = RollingStats(config["ewma_alpha"], config["window"])
+        self.hosts: "OrderedDict[str, RollingStats]" = OrderedDict()
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.ejections = 0
+
+    def host_stats(self, host: str) -> Optional[RollingStats]:
+        stats = self.hosts.get(host)
+        if stats is not None:
+            self.hosts.move_to_end(host)
+        return stats
+
+    def record(self, host: str, latency: float, ok: bool) -> None:
+        self.overall.record(latency, ok)
+        stats = self.host_stats(host)
+        if stats is None:
+            stats = self.hosts[host] = RollingStats(self.config["ewma_alpha"], self.config["window"])
+            if len(self.hosts) > self.config["max_hosts"]:
+                self.hosts.popitem(last=False)
+        stats.record(latency, ok)
+
+        if ok:
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+            return
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.config["failure_threshold"]:
+            # Open (or, after a failed half-open trial, re-open) the breaker
+            self.open_until = time.time() + self.config["cooldown"]
+            self.ejections += 1
+
+    def is_open(self, now: float) -> bool:
+        return now < self.open_until
+
+    def score(self, host: str) -> float:
+        """Expected cost of sending a request for `host` through this route (lower is better)"""
+        stats = self.host_stats(host)
+        if stats is None or stats.requests < self.config["min_samples"]:
+            stats = self.overall
+        # Untried routes look fast so they get probed
+        latency = stats.latency if stats.latency is not None else 0.0
+        return latency * (1 + 4 * stats.error_rate) + stats.error_rate
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        if not self.is_open(now):
+            state = "half_open" if self.consecutive_failures >= self.config["failure_threshold"] else "closed"
+        else:
+            state = "open"
+        return {
+            "name": self.route.name,
+            "state": state,
+            "cooldown_remaining": round(max(0.0, self.open_until - now), 1),
+            "consecutive_failures": self.consecutive_failures,
+            "ejections": self.ejections,
+            **self.overall.to_dict(),
+            # Most recently used hosts first
+            "hosts": {host: stats.to_dict() for host, stats in islice(reversed(self.hosts.items()), 20)},
+        }
+
+
+class ProxyPool:
+    """Picks the best route per target host and decides when to hedge a slow request
+
+    Every route keeps rolling latency/error scores overall and per target host. After
+    `failure_threshold` consecutive failures a route's circuit breaker opens and it is
+    skipped for `cooldown` seconds; the next request after that is a trial that closes
+    the breaker on success or re-opens it on failure.
+    """
+
+    def __init__(self, routes: Iterable[ProxyRoute], config: Dict[str, Any]):
+        self.config = config
+        self._states = [RouteState(route, config) for route in routes]
+        if not self._states:
+            raise ValueError("A proxy pool needs at least one route")
+        self._hosts: "OrderedDict[str, RollingStats]" = OrderedDict()
+        self._stats = {"hedged": 0, "hedge_wins": 0}
+
+    @property
+    def routes(self) -> List[ProxyRoute]:
+        return [state.route for state in self._states]
+
+    def _state(self, route: ProxyRoute) -> RouteState:
+        for state in self._states:
+            if state.route is route:
+                return state
+        raise KeyError(route.name)
+
+    def choose(self, host: str, exclude: Iterable[ProxyRoute] = (), allow_open: bool = True) -> Optional[ProxyRoute]:
+        """Best route for a host, skipping excluded routes and routes with an open breaker
+
+        When every breaker is open the route that re-opens first is used (unless `allow_open`
+        is False), so requests never fail just because the pool is cooling down.
+        """
+        excluded = {id(route) for route in exclude}
+        candidates = [state for state in self._states if id(state.route) not in excluded]
+        if not candidates:
+            return None
+        now = time.time()
+        closed = [state for state in candidates if not state.is_open(now)]
+        if not closed:
+            if not allow_open:
+                return None
+            return min(candidates, key=lambda state: state.open_until).route
+        return min(closed, key=lambda state: state.score(host)).route
+
+    def record(self, route: ProxyRoute, host: str, latency: float, ok: bool) -> None:
+        """Record how long a route took to answer (response headers) and whether it worked"""
+        self._state(route).record(host, latency, ok)
+        if ok:
+            stats = self._hosts.get(host)
+            if stats is None:
+                stats = self._hosts[host] = RollingStats(self.config["ewma_alpha"], self.config["window"])
+                if len(self._hosts) > self.config["max_hosts"]:
+                    self._hosts.popitem(last=False)
+            else:
+                self._hosts.move_to_end(host)
+            stats.record(latency, ok)
+
+    def hedge_delay(self, host: str) -> float:
+        """How long to wait for the first attempt before starting a second one (observed p95)"""
+        stats = self._hosts.get(host)
+        p95 = stats.percentile(0.95) if stats is not None and len(stats.samples) >= self.config["min_samples"] else None
+        if p95 is None:
+            samples = [latency for state in self._states for latency in state.overall.samples]
+            if len(samples) >= self.config["min_samples"]:
+                samples.sort()
+                p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        if p95 is None:
+            p95 = self.config["hedge_default_delay"]
+        return max(p95, self.config["hedge_min_delay"])
+
+    def count_hedge(self, won: bool) -> None:
+        self._stats["hedged"] += 1
+        if won:
+            self._stats["hedge_wins"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            **self._stats,
+            "hedging": self.config["hedge_enabled"],
+            "failure_threshold": self.config["failure_threshold"],
+            "cooldown": self.config["cooldown"],
+            "routes": [state.to_dict(now) for state in self._states],
+        }
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterable, Optional
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:  # optional: plain json is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip is offered without it
+    brotli = None
+
+RESPONSE_FORMATS = {"json", "raw", "ndjson"}
+
+# Media types that are already compressed or must reach the client unbuffered
+_UNCOMPRESSED_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "text/event-stream")
+# Chunks above this are compressed in a worker thread instead of on the event loop
+_THREAD_COMPRESS_BYTES = 256 * 1024
+
+
+def dumps(value: Any) -> bytes:
+    """Encode JSON as UTF-8 bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered through dumps()"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+async def ndjson_items(items: Iterable[Any], batch: int = 256) -> AsyncIterator[bytes]:
+    """Stream items as NDJSON, a batch of lines at a time, yielding to the loop in between"""
+    lines = []
+    for item in items:
+        lines.append(dumps(item) + b"\n")
+        if len(lines) >= batch:
+            yield b"".join(lines)
+            lines = []
+            await asyncio.sleep(0)
+    if lines:
+        yield b"".join(lines)
+
+
+def choose_encoding(accept_encoding: str, brotli_enabled: bool = True) -> Optional[str]:
+    """Best supported content coding from an Accept-Encoding header (br over gzip at equal q)"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip()] = quality
+    offered = ["br", "gzip"] if brotli is not None and brotli_enabled else ["gzip"]
+    ranked = [(weights.get(name, weights.get("*", 0.0)), -index, name) for index, name in enumerate(offered)]
+    quality, _, name = max(ranked)
+    return name if quality > 0 else None
+
+
+class _Compressor:
+    """Incremental gzip/brotli compressor; every chunk is flushed so streams stay live"""
+
+    def __init__(self, encoding: str, config: Dict[str, Any]):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=config["brotli_quality"])
+        else:
+            self._zlib = zlib.compressobj(config["gzip_level"], zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """gzip/brotli response compression negotiated via Accept-Encoding
+
+    Like Starlette's GZipMiddleware, but also offers brotli (when the `brotli` package is
+    installed), flushes every streamed chunk so NDJSON/streamed results arrive as they are
+    produced, and compresses large chunks off the event loop.
+    """
+
+    def __init__(self, app: ASGIApp, config: Dict[str, Any]):
+        self.app = app
+        self.config = config
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.config["enabled"]:
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.config["brotli"])
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self.app, encoding, self.config)(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str, config: Dict[str, Any]):
+        self.app = app
+        self.encoding = encoding
+        self.config = config
+        self.send: Optional[Send] = None
+        self.start: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def _compress(self, body: bytes, final: bool) -> bytes:
+        if len(body) > _THREAD_COMPRESS_BYTES:
+            return await asyncio.to_thread(self.compressor.compress, body, final)
+        return self.compressor.compress(body, final)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Hold the headers until the first body chunk shows whether compressing pays off
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            media_type = headers.get("content-type", "")
+            self.passthrough = "content-encoding" in headers or media_type.startswith(_UNCOMPRESSED_TYPES)
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            if self.passthrough or (not more_body and len(body) < self.config["min_bytes"]):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            self.compressor = _Compressor(self.encoding, self.config)
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            body = await self._compress(body, not more_body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self.send(start)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+        body = await self._compress(body, not more_body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -0,0 +1,101 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from app.extraction import UrlJoiner, clean_text, load_parser
+
+# Attributes holding URLs; their values are resolved against the page URL
+URL_ATTRIBUTES = frozenset({"href", "src", "action", "poster"})
+
+SELECTOR_CACHE_SIZE = 512
+
+
+class SelectorError(ValueError):
+    """A schema field has no selector or an invalid CSS/XPath expression"""
+
+
+@lru_cache(maxsize=SELECTOR_CACHE_SIZE)
+def compile_selector(kind: str, expression: str, first_only: bool = False) -> Any:
+    """Compiled lxml XPath for a CSS selector or XPath expression, cached by expression
+
+    With `first_only` the expression is wrapped as `(...)[1]`, so single-valued fields
+    don't build the full node set.
+    """
+    etree = load_parser()
+    if kind == "css":
+        try:
+            from cssselect import HTMLTranslator, SelectorError as CssSelectorError
+        except ImportError:
+            raise SelectorError("CSS selectors need the cssselect package; use xpath instead")
+        try:
+            expression = HTMLTranslator().css_to_xpath(expression)
+        except CssSelectorError as e:
+            raise SelectorError(f"Invalid CSS selector: {e}")
+    try:
+        return etree.XPath(f"({expression})[1]" if first_only else expression)
+    except etree.XPathSyntaxError as e:
+        raise SelectorError(f"Invalid XPath expression: {e}")
+
+
+def field_selector(field: Dict[str, Any]) -> Any:
+    if bool(field.get("css")) == bool(field.get("xpath")):
+        raise SelectorError("Each field needs exactly one of css or xpath")
+    kind = "css" if field.get("css") else "xpath"
+    return compile_selector(kind, field[kind], not field.get("many", False))
+
+
+def validate_fields(fields: Dict[str, Dict[str, Any]]) -> None:
+    """Compile every selector up front; raises SelectorError naming the first bad field"""
+    if not fields:
+        raise SelectorError("Please provide at least one field")
+    for name, field in fields.items():
+        try:
+            field_selector(field)
+        except SelectorError as e:
+            raise SelectorError(f"{name}: {e}")
+
+
+def _value(node: Any, attr: Optional[str], joiner: Optional[UrlJoiner]) -> Any:
+    if isinstance(node, (bool, float)):
+        # XPath functions such as count() or boolean()
+        return node
+    if isinstance(node, str):
+        # XPath selecting attributes or text nodes directly; URL attributes (//a/@href)
+        # are resolved like `attr` values
+        attrname = getattr(node, "attrname", None)
+        if attrname is not None and joiner is not None and attrname.lower() in URL_ATTRIBUTES:
+            return joiner.link(str(node))
+        return str(node)
+    if attr:
+        value = node.get(attr)
+        if value is not None and joiner is not None and attr.lower() in URL_ATTRIBUTES:
+            value = joiner.link(value)
+        return value
+    return clean_text("".join(node.itertext()))
+
+
+def extract_fields(html: str, base_url: Optional[str], fields: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Evaluate every field of a schema against one parse of the page
+
+    Fields with `many` return a list of values, others the first match (or None).
+    Values are the element text, or `attr` when given (URLs resolved against `base_url`).
+    Raises SelectorError naming the field when an XPath compiles but can't be evaluated
+    (unknown functions or variables).
+    """
+    etree = load_parser()
+    root = etree.fromstring(html.encode("utf-8"), etree.HTMLParser(encoding="utf-8")) if html.strip() else None
+    joiner = UrlJoiner(base_url) if base_url else None
+    results: Dict[str, Any] = {}
+    for name, field in fields.items():
+        many = field.get("many", False)
+        if root is None:
+            results[name] = [] if many else None
+            continue
+        try:
+            matches = field_selector(field)(root)
+        except etree.XPathEvalError as e:
+            raise SelectorError(f"{name}: Invalid XPath expression: {e}")
+        if not isinstance(matches, list):
+            matches = [matches]
+        values: List[Any] = [_value(node, field.get("attr"), joiner) for node in matches]
+        results[name] = values if many else (values[0] if values else None)
+    return results
@@ -0,0 +1,34 @@
+import hashlib
+import os
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+
+
+class StaticPage:
+    """An HTML file read once into memory and served with an ETag"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        return HTMLResponse(self.body, headers=headers)
+
+
+def preload_pages(directory: str, names: tuple) -> Dict[str, Optional[StaticPage]]:
+    """Read the given pages from `directory` up front (None for a missing file)"""
+    pages: Dict[str, Optional[StaticPage]] = {}
+    for name in names:
+        try:
+            with open(os.path.join(directory, name), "rb") as f:
+                pages[name] = StaticPage(f.read())
+        except OSError:
+            pages[name] = None
+    return pages
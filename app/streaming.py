@@ -0,0 +1,166 @@
+import asyncio
+import codecs
+from collections import deque
+from typing import Any, Deque, List, Optional, Tuple
+
+import httpx
+
+from app.extraction import PageExtractor, load_parser, new_parser
+from app.responses import dumps
+
+
+async def read_body(response: httpx.Response, max_bytes: int) -> Tuple[str, bool]:
+    """Read and decode a streamed body, stopping at max_bytes. Returns (text, truncated)"""
+    chunks: List[bytes] = []
+    size = 0
+    truncated = False
+    async for chunk in response.aiter_bytes():
+        if size + len(chunk) > max_bytes:
+            chunks.append(chunk[:max_bytes - size])
+            truncated = True
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    return b"".join(chunks).decode(response.encoding or "utf-8", errors="replace"), truncated
+
+
+class ChunkBuffer:
+    """Body chunks on their way to one client; None marks the end
+
+    put() waits while `limit` chunks are pending, so a slow client slows the download down
+    instead of growing the buffer. Once released (another request needs the fetch to finish,
+    or the client went away), or when the client has taken nothing for `stall_timeout`
+    seconds, put() stops waiting.
+    """
+
+    def __init__(self, limit: int, stall_timeout: float):
+        self.limit = limit
+        self.stall_timeout = stall_timeout
+        self.released = False
+        self._chunks: Deque[Optional[bytes]] = deque()
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+
+    async def put(self, chunk: Optional[bytes]) -> None:
+        if len(self._chunks) >= self.limit and not self.released:
+            self._writable.clear()
+            try:
+                await asyncio.wait_for(self._writable.wait(), self.stall_timeout)
+            except asyncio.TimeoutError:
+                self.released = True
+        self._chunks.append(chunk)
+        self._readable.set()
+
+    async def get(self) -> Optional[bytes]:
+        while not self._chunks:
+            self._readable.clear()
+            await self._readable.wait()
+        chunk = self._chunks.popleft()
+        if len(self._chunks) < self.limit:
+            self._writable.set()
+        return chunk
+
+    def release(self) -> None:
+        self.released = True
+        self._writable.set()
+
+
+async def pump_body(response: httpx.Response, buffer: ChunkBuffer, max_bytes: int, keep: bool = False) -> Tuple[str, bool]:
+    """Forward body chunks into a buffer (None marks the end). Returns (text, truncated)
+
+    The decoded body is only kept (and returned) with `keep`; otherwise text is "".
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace") if keep else None
+    parts: List[str] = []
+    size = 0
+    truncated = False
+    try:
+        async for chunk in response.aiter_bytes():
+            if size + len(chunk) > max_bytes:
+                chunk = chunk[:max_bytes - size]
+                truncated = True
+            size += len(chunk)
+            if decoder is not None:
+                parts.append(decoder.decode(chunk))
+            await buffer.put(chunk)
+            if truncated:
+                break
+    except httpx.HTTPError:
+        # The envelope has already started; report an interrupted body as truncated
+        truncated = True
+    await buffer.put(None)
+    if decoder is not None:
+        parts.append(decoder.decode(b"", final=True))
+    return "".join(parts), truncated
+
+
+def json_escape(text: str) -> bytes:
+    """Escape text for embedding inside a JSON string literal (UTF-8 encoded)"""
+    return dumps(text)[1:-1]
+
+
+class IncrementalExtractor:
+    """Feed HTML chunks into a PageExtractor as they arrive, stopping as soon as possible
+
+    Results match the full extraction truncated to `limit` items.
+    """
+
+    def __init__(self, content_type: str, base_url: str, limit: Optional[int] = None, encoding: str = "utf-8"):
+        self.content_type = content_type
+        self.page = PageExtractor({content_type}, base_url, limit)
+        self._parser = new_parser(self.page, encoding)
+        self._pending = b""
+        self._closed = False
+        self.done = False
+
+    @property
+    def title(self) -> Optional[str]:
+        return self.page.title
+
+    def feed(self, chunk: bytes) -> bool:
+        """Feed a chunk of the body; returns True once no more input is needed"""
+        if not self.done:
+            # libxml2's push parser can miss an end tag split across two feeds
+            # (e.g. "</scr" + "ipt>"), so only feed up to the last "<" seen
+            self._pending += chunk
+            cut = self._pending.rfind(b"<")
+            if cut > 0:
+                self._parser.feed(self._pending[:cut])
+                self._pending = self._pending[cut:]
+                self.done = self.page.satisfied()
+        return self.done
+
+    def close(self) -> None:
+        """Signal the end of the document"""
+        if self._closed:
+            return
+        self._closed = True
+        if not self.done:
+            etree = load_parser()
+            try:
+                if self._pending:
+                    self._parser.feed(self._pending)
+                self._parser.close()
+            except etree.XMLSyntaxError:
+                self.page.close()
+        self.done = True
+
+    def results(self) -> Any:
+        return self.page.results()[self.content_type]
+
+
+async def feed_body(response: httpx.Response, extractor: IncrementalExtractor, max_bytes: int) -> bool:
+    """Feed a streamed body into an extractor until it is satisfied or max_bytes is hit. Returns truncated"""
+    size = 0
+    truncated = False
+    async for chunk in response.aiter_bytes():
+        if size + len(chunk) > max_bytes:
+            chunk = chunk[:max_bytes - size]
+            truncated = True
+        size += len(chunk)
+        if extractor.feed(chunk):
+            return False
+        if truncated:
+            break
+    extractor.close()
+    return truncated
@@ -0,0 +1,154 @@
+"""Cold-start benchmark
+
+Every run starts a fresh interpreter (as a serverless cold start does) that imports the
+deployed entry point, api/index.py, and then serves its first requests in-process:
+
+    python -m benchmarks.coldstart                          # 7 runs in lazy startup mode
+    python -m benchmarks.coldstart --max-import-ms 800      # exit 1 if the median exceeds it
+    python -m benchmarks.coldstart --compare old.json
+
+Reported per run: import time of api.index, time to the first response for `/` and to the
+first `/scrape` (which pays for the deferred parser and connection setup), the whole
+process lifetime, and which heavy modules were loaded by the import alone.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Modules that should only be imported once a scrape needs them
+DEFERRED_MODULES = ("bs4", "lxml.etree")
+
+# Runs inside the fresh interpreter; prints one JSON line
+_PROBE = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import api.index
+imported = time.perf_counter()
+loaded = {name: name in sys.modules for name in %(deferred)r}
+import httpx
+
+async def first_requests():
+    transport = httpx.ASGITransport(app=api.index.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://coldstart") as client:
+        began = time.perf_counter()
+        root = await client.get("/")
+        root_ms = (time.perf_counter() - began) * 1000
+        began = time.perf_counter()
+        scrape = await client.get("/scrape", params={"url": %(scrape_url)r, "type": "links"})
+        scrape_ms = (time.perf_counter() - began) * 1000
+    return root.status_code, root_ms, scrape.status_code, scrape_ms
+
+root_status, root_ms, scrape_status, scrape_ms = asyncio.run(first_requests())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_response_ms": root_ms,
+    "first_scrape_ms": scrape_ms,
+    "statuses": [root_status, scrape_status],
+    "loaded_by_import": loaded,
+}))
+"""
+
+
+def run_once(scrape_url: str, env: Dict[str, str]) -> Dict[str, Any]:
+    probe = _PROBE % {"deferred": DEFERRED_MODULES, "scrape_url": scrape_url}
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    process_ms = (time.perf_counter() - started) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"cold-start probe failed:\n{completed.stderr}")
+    record = json.loads(completed.stdout.strip().splitlines()[-1])
+    record["process_ms"] = process_ms
+    return record
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {}
+    for key in ("import_ms", "first_response_ms", "first_scrape_ms", "process_ms"):
+        values = [run[key] for run in runs]
+        summary[key] = {"median": round(statistics.median(values), 2), "min": round(min(values), 2), "max": round(max(values), 2)}
+    summary["loaded_by_import"] = runs[-1]["loaded_by_import"]
+    summary["statuses"] = runs[-1]["statuses"]
+    return summary
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(f"\nChanges against {baseline['meta'].get('revision')} ({baseline['meta'].get('started_at')}):")
+    for key, values in current["summary"].items():
+        old = baseline["summary"].get(key)
+        if isinstance(values, dict) and "median" in values and old and old["median"]:
+            print(f"  {key:<18} {(values['median'] / old['median'] - 1) * 100:+7.1f}%")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Scraper API cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=7, help="fresh interpreters to start (default: 7)")
+    parser.add_argument("--mode", default="lazy", choices=["lazy", "eager"], help="STARTUP_MODE for the runs")
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import time exceeds this")
+    parser.add_argument("--max-first-response-ms", type=float, help="fail if the median import + first response exceeds this")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/coldstart-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier cold-start results file to compare against")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    from benchmarks.origin import start_origin
+    from benchmarks.run import git_revision
+
+    env = {**os.environ, "STARTUP_MODE": args.mode, "CACHE_ENABLED": "false", "JOBS_STORE": "memory",
+           "USE_PROXY": "false", "PROXY_LIST": ""}
+    started_at = datetime.now(timezone.utc)
+    process, origin = start_origin()
+    try:
+        # The first run also warms the OS file cache and writes bytecode; it's not counted
+        run_once(f"{origin}/links/200", env)
+        runs = []
+        for index in range(args.runs):
+            record = run_once(f"{origin}/links/200", env)
+            runs.append(record)
+            print(f"run {index + 1}: import {record['import_ms']:7.1f}ms  first response {record['first_response_ms']:6.1f}ms  "
+                  f"first scrape {record['first_scrape_ms']:7.1f}ms  process {record['process_ms']:7.1f}ms", flush=True)
+    finally:
+        process.terminate()
+
+    report = {
+        "meta": {"started_at": started_at.isoformat(timespec="seconds"), "revision": git_revision(),
+                 "python": sys.version.split()[0], "mode": args.mode, "runs": args.runs},
+        "summary": summarize(runs),
+        "runs": runs,
+    }
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", "coldstart-" + started_at.strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+    summary = report["summary"]
+    failures = []
+    if args.max_import_ms is not None and summary["import_ms"]["median"] > args.max_import_ms:
+        failures.append(f"median import {summary['import_ms']['median']}ms > {args.max_import_ms}ms")
+    first_response = summary["import_ms"]["median"] + summary["first_response_ms"]["median"]
+    if args.max_first_response_ms is not None and first_response > args.max_first_response_ms:
+        failures.append(f"median time to first response {first_response:.1f}ms > {args.max_first_response_ms}ms")
+    if args.mode == "lazy":
+        failures += [f"{name} is imported at startup" for name, loaded in summary["loaded_by_import"].items() if loaded]
+    if failures:
+        print("Cold-start regression: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Synthetic origin server for the benchmarks
+
+Serves deterministic pages from memory so runs are reproducible and need no network:
+
+- /page/<bytes>          mixed content (text, links, images, scripts, styles) of about <bytes>
+- /links/<count>         link-heavy page
+- /images/<count>        image-heavy page
+- /styles/<count>        elements with inline background-image styles
+- /drip/<bytes>?chunks=N&delay=S   a page sent in N chunks, S seconds apart
+- /status/<code>         an error response with a small body
+"""
+import multiprocessing
+import random
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+from urllib.parse import parse_qs, urlsplit
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore "
+         "et dolore magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris").split()
+
+
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _document(title: str, body: str) -> bytes:
+    return (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{title}</title>"
+            f"<style>body {{ font-family: sans-serif; }}</style></head><body>{body}</body></html>").encode("utf-8")
+
+
+@lru_cache(maxsize=64)
+def mixed_page(size: int) -> bytes:
+    rng = random.Random(size)
+    blocks = []
+    total = 0
+    index = 0
+    while total < size:
+        block = (
+            f"<div class=\"card\"><h2>{_sentence(rng, 4)}</h2><p>{_sentence(rng, 40)} &amp; {_sentence(rng, 20)}</p>"
+            f"<a href=\"/article/{index}\">{_sentence(rng, 3)}</a> <a href=\"https://example.org/{index}?q=1\">ext</a>"
+            f"<img src=\"/img/{index}.jpg\" alt=\"\"><div style=\"background-image:url('/bg/{index}.png')\"></div>"
+            f"<script>var item{index} = {{\"id\": {index}}};</script></div>\n"
+        )
+        blocks.append(block)
+        total += len(block)
+        index += 1
+    return _document(f"Mixed page {size}", "".join(blocks))
+
+
+@lru_cache(maxsize=16)
+def links_page(count: int) -> bytes:
+    rng = random.Random(count)
+    body = "".join(f"<li><a href=\"{'/' if i % 3 else '../'}section/{i}\">{_sentence(rng, 3)}</a></li>" for i in range(count))
+    return _document(f"Links {count}", f"<ul>{body}</ul>")
+
+
+@lru_cache(maxsize=16)
+def images_page(count: int) -> bytes:
+    body = "".join(f"<figure><img src=\"images/{i}.jpg\" width=\"64\"><figcaption>#{i}</figcaption></figure>" for i in range(count))
+    return _document(f"Images {count}", body)
+
+
+@lru_cache(maxsize=16)
+def styles_page(count: int) -> bytes:
+    body = "".join(f"<div style=\"color:#333;background:url('/tiles/{i}.png') no-repeat\">tile {i}</div>" for i in range(count))
+    return _document(f"Styles {count}", body)
+
+
+def route(path: str) -> Tuple[int, bytes]:
+    """(status, body) for a benchmark path"""
+    parts = path.strip("/").split("/")
+    try:
+        kind, value = parts[0], int(parts[1])
+    except (IndexError, ValueError):
+        return 404, b"<html><head><title>Not found</title></head><body>unknown path</body></html>"
+    if kind in ("page", "drip"):
+        return 200, mixed_page(value)
+    if kind == "links":
+        return 200, links_page(value)
+    if kind == "images":
+        return 200, images_page(value)
+    if kind == "styles":
+        return 200, styles_page(value)
+    if kind == "status":
+        return value, f"<html><head><title>Error {value}</title></head><body>error {value}</body></html>".encode("utf-8")
+    return 404, b"<html><head><title>Not found</title></head><body>unknown path</body></html>"
+
+
+class OriginHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without this, delayed ACKs add ~40 ms per response
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        status, body = route(url.path)
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        try:
+            if url.path.startswith("/drip/"):
+                query = parse_qs(url.query)
+                chunks = max(1, int(query.get("chunks", ["10"])[0]))
+                delay = float(query.get("delay", ["0.05"])[0])
+                step = -(-len(body) // chunks)
+                for offset in range(0, len(body), step):
+                    self.wfile.write(body[offset:offset + step])
+                    self.wfile.flush()
+                    time.sleep(delay)
+            else:
+                self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The scraper stopped reading early (e.g. type=title); that's expected
+            self.close_connection = True
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class OriginServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def _serve(port_sink) -> None:
+    server = OriginServer(("127.0.0.1", 0), OriginHandler)
+    port_sink.send(server.server_address[1])
+    server.serve_forever()
+
+
+def start_origin() -> Tuple[multiprocessing.Process, str]:
+    """Start the origin in a child process (so it doesn't share the GIL with the app); returns (process, base_url)"""
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.get_context("spawn").Process(target=_serve, args=(sender,), daemon=True)
+    process.start()
+    port = receiver.recv()
+    return process, f"http://127.0.0.1:{port}"
+
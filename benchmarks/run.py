@@ -0,0 +1,331 @@
+"""Load, latency and extraction benchmarks
+
+Starts the synthetic origin (benchmarks/origin.py) in a child process and drives the
+FastAPI app in-process through httpx's ASGI transport, so nothing leaves the machine.
+
+    python -m benchmarks.run                     # full suite, results in benchmarks/results/
+    python -m benchmarks.run --quick             # smaller matrix for a smoke run
+    python -m benchmarks.run --compare old.json  # print changes against an earlier run
+
+Results are JSON: one record per load scenario (throughput, p50/p95/p99 latency, peak RSS,
+status counts) and per micro-benchmark (time per call of each extract_* function).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+TYPES = ("html", "title", "links", "images", "text", "scripts")
+PAGE_SIZES = (10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1000 * 1000)
+# Requests per scenario are scaled down so no scenario downloads much more than this
+MAX_SCENARIO_BYTES = 200 * 1024 * 1024
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes (Linux /proc, falling back to the peak)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssSampler:
+    """Track the peak RSS while a scenario runs by sampling from a background thread"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "RssSampler":
+        self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def scenario_requests(requested: int, page_bytes: int) -> int:
+    return max(3, min(requested, MAX_SCENARIO_BYTES // max(page_bytes, 1)))
+
+
+def load_scenarios(quick: bool, concurrency_levels: List[int], types: List[str]) -> List[Dict[str, Any]]:
+    """(name, path, type, concurrency, approximate page bytes) for every load scenario"""
+    scenarios = []
+    # Every type at every concurrency level on a typical 100 KB page
+    for content_type in types:
+        for concurrency in concurrency_levels:
+            scenarios.append({"name": "mixed-100k", "path": "/page/102400", "type": content_type,
+                              "concurrency": concurrency, "bytes": 102400})
+    sizes = PAGE_SIZES[:3] if quick else PAGE_SIZES
+    levels = concurrency_levels[:1] if quick else [concurrency_levels[0], concurrency_levels[-1]]
+    for size in sizes:
+        for content_type in ("html", "text"):
+            for concurrency in levels:
+                scenarios.append({"name": f"mixed-{size}", "path": f"/page/{size}", "type": content_type,
+                                  "concurrency": concurrency, "bytes": size})
+    count = 2000 if quick else 20000
+    for name, path, content_type in (
+        ("links-heavy", f"/links/{count}", "links"),
+        ("images-heavy", f"/images/{count}", "images"),
+        ("inline-styles", f"/styles/{count}", "images"),
+        ("slow-drip", "/drip/204800?chunks=20&delay=0.02", "html"),
+        ("slow-drip", "/drip/204800?chunks=20&delay=0.02", "title"),
+        ("error-404", "/status/404", "html"),
+        ("error-500", "/status/500", "html"),
+    ):
+        for concurrency in levels:
+            scenarios.append({"name": name, "path": path, "type": content_type, "concurrency": concurrency,
+                              "bytes": count * 100 if "heavy" in name or "styles" in name else 204800})
+    return scenarios
+
+
+async def run_scenario(client: Any, origin: str, scenario: Dict[str, Any], requests: int) -> Dict[str, Any]:
+    """Fire `requests` scrapes at the given concurrency and summarize their latency"""
+    params = {"url": origin + scenario["path"], "type": scenario["type"], "cache": "bypass"}
+    total = scenario_requests(requests, scenario["bytes"])
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    response_bytes = 0
+    remaining = iter(range(total))
+
+    async def one() -> None:
+        nonlocal response_bytes
+        started = time.perf_counter()
+        response = await client.get("/scrape", params=params)
+        latencies.append(time.perf_counter() - started)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+        response_bytes += len(response.content)
+
+    async def worker() -> None:
+        for _ in remaining:
+            await one()
+
+    # Warm up connections and caches outside the measurement
+    for _ in range(min(2, total)):
+        await client.get("/scrape", params=params)
+
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(scenario["concurrency"])))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "scenario": scenario["name"],
+        "path": scenario["path"],
+        "type": scenario["type"],
+        "concurrency": scenario["concurrency"],
+        "requests": total,
+        "statuses": statuses,
+        "throughput_rps": round(total / elapsed, 2),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 2),
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "max": round(max(latencies) * 1000, 2),
+        },
+        "response_bytes": response_bytes,
+        "peak_rss_mb": round(rss.peak / (1024 * 1024), 1),
+    }
+
+
+async def run_load(args: argparse.Namespace, origin: str) -> List[Dict[str, Any]]:
+    import httpx
+    from app import main
+
+    results = []
+    scenarios = load_scenarios(args.quick, args.concurrency, args.types)
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for index, scenario in enumerate(scenarios, 1):
+                result = await run_scenario(client, origin, scenario, args.requests)
+                results.append(result)
+                print(f"[{index}/{len(scenarios)}] {result['scenario']:<14} type={result['type']:<8} "
+                      f"c={result['concurrency']:<3} {result['throughput_rps']:>8.1f} req/s  "
+                      f"p50={result['latency_ms']['p50']:>9.2f}ms p99={result['latency_ms']['p99']:>9.2f}ms  "
+                      f"rss={result['peak_rss_mb']}MB {result['statuses']}", flush=True)
+    return results
+
+
+def time_call(func: Any, min_time: float) -> Tuple[float, int]:
+    """Median seconds per call, repeating until at least `min_time` has been spent"""
+    samples: List[float] = []
+    spent = 0.0
+    while spent < min_time or len(samples) < 3:
+        started = time.perf_counter()
+        func()
+        duration = time.perf_counter() - started
+        samples.append(duration)
+        spent += duration
+    return statistics.median(samples), len(samples)
+
+
+def run_micro(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Time each extract_* function, and the single-pass engine, on synthetic pages"""
+    from bs4 import BeautifulSoup
+
+    from app import main
+    from app.extraction import extract_page
+    from benchmarks.origin import images_page, links_page, mixed_page, styles_page
+
+    pages = [(f"mixed-{size}", mixed_page(size)) for size in PAGE_SIZES[:3 if args.quick else 4]]
+    pages += [("links-heavy", links_page(5000)), ("images-heavy", images_page(5000)), ("inline-styles", styles_page(5000))]
+    base_url = "http://bench.local/dir/page.html"
+    functions = {
+        "images": lambda soup: main.extract_images(soup, base_url),
+        "links": lambda soup: main.extract_links(soup, base_url),
+        "text": lambda soup: main.extract_text(soup),
+        "scripts": lambda soup: main.extract_scripts(soup),
+    }
+
+    results = []
+    for page_name, body in pages:
+        html = body.decode("utf-8")
+        min_time = args.micro_time
+        parse, runs = time_call(lambda: BeautifulSoup(html, "lxml"), min_time)
+        results.append({"benchmark": "bs4_parse", "page": page_name, "bytes": len(body),
+                        "ms_per_call": round(parse * 1000, 3), "runs": runs})
+        for name, func in functions.items():
+            # extract_text mutates the soup, so every call gets a fresh one; parsing is subtracted
+            total, runs = time_call(lambda: func(BeautifulSoup(html, "lxml")), min_time)
+            results.append({"benchmark": f"extract_{name}", "page": page_name, "bytes": len(body),
+                            "ms_per_call": round(max(total - parse, 0.0) * 1000, 3),
+                            "ms_per_call_with_parse": round(total * 1000, 3), "runs": runs})
+            engine, runs = time_call(lambda: extract_page(html, base_url, [name]), min_time)
+            results.append({"benchmark": f"extract_page[{name}]", "page": page_name, "bytes": len(body),
+                            "ms_per_call": round(engine * 1000, 3), "runs": runs})
+        engine, runs = time_call(lambda: extract_page(html, base_url, ["links", "images", "scripts", "text"]), min_time)
+        results.append({"benchmark": "extract_page[all]", "page": page_name, "bytes": len(body),
+                        "ms_per_call": round(engine * 1000, 3), "runs": runs})
+        print(f"micro {page_name:<14} bs4 parse {parse * 1000:9.2f}ms  single pass (all) {engine * 1000:9.2f}ms", flush=True)
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print throughput/latency changes against an earlier results file"""
+    def load_key(record: Dict[str, Any]) -> Tuple:
+        return record["scenario"], record["path"], record["type"], record["concurrency"]
+
+    before = {load_key(record): record for record in baseline.get("load", [])}
+    print(f"\nChanges against {baseline['meta'].get('revision')} ({baseline['meta'].get('started_at')}):")
+    for record in current.get("load", []):
+        old = before.get(load_key(record))
+        if old is None:
+            continue
+        rps = (record["throughput_rps"] / old["throughput_rps"] - 1) * 100 if old["throughput_rps"] else 0.0
+        p95 = (record["latency_ms"]["p95"] / old["latency_ms"]["p95"] - 1) * 100 if old["latency_ms"]["p95"] else 0.0
+        print(f"  {record['scenario']:<14} type={record['type']:<8} c={record['concurrency']:<3} "
+              f"throughput {rps:+7.1f}%  p95 {p95:+7.1f}%")
+    micro_before = {(record["benchmark"], record["page"]): record for record in baseline.get("micro", [])}
+    for record in current.get("micro", []):
+        old = micro_before.get((record["benchmark"], record["page"]))
+        if old is not None and old["ms_per_call"]:
+            change = (record["ms_per_call"] / old["ms_per_call"] - 1) * 100
+            print(f"  {record['benchmark']:<22} {record['page']:<14} {change:+7.1f}%")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Scraper API benchmarks")
+    parser.add_argument("--requests", type=int, default=60, help="requests per load scenario (scaled down for big pages)")
+    parser.add_argument("--concurrency", type=lambda value: [int(part) for part in value.split(",")], default=[1, 8, 32],
+                        help="comma-separated concurrency levels (default: 1,8,32)")
+    parser.add_argument("--types", type=lambda value: value.split(","), default=list(TYPES),
+                        help="comma-separated scrape types for the type matrix")
+    parser.add_argument("--micro-time", type=float, default=0.5, help="seconds spent per micro-benchmark")
+    parser.add_argument("--quick", action="store_true", help="smaller pages and fewer scenarios")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+    if args.quick:
+        args.requests = min(args.requests, 20)
+        args.micro_time = min(args.micro_time, 0.2)
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    # Benchmark the app as deployed, minus anything that would skew repeated runs
+    os.environ.setdefault("CACHE_ENABLED", "false")
+    os.environ.setdefault("JOBS_STORE", "memory")
+    os.environ.setdefault("USE_PROXY", "false")
+    os.environ.setdefault("PROXY_LIST", "")
+
+    from benchmarks.origin import start_origin
+
+    started_at = datetime.now(timezone.utc)
+    report: Dict[str, Any] = {
+        "meta": {
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parse_executor": os.getenv("PARSE_EXECUTOR", "thread"),
+            "args": {name: value for name, value in vars(args).items() if name not in ("output", "compare")},
+        },
+        "load": [],
+        "micro": [],
+    }
+
+    if not args.skip_load:
+        process, origin = start_origin()
+        try:
+            report["load"] = asyncio.run(run_load(args, origin))
+        finally:
+            process.terminate()
+    if not args.skip_micro:
+        report["micro"] = run_micro(args)
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", started_at.strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
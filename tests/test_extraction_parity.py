@@ -0,0 +1,140 @@
+"""The single-pass extractor (app.extraction) must give the same results as the
+BeautifulSoup extract_* functions in app.main it replaces"""
+import os
+import sys
+from urllib.parse import urljoin
+
+import pytest
+from bs4 import BeautifulSoup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app import main  # noqa: E402
+from app.extraction import EARLY_STOP_SLICE, UrlJoiner, extract_page  # noqa: E402
+from benchmarks.origin import images_page, links_page, mixed_page, styles_page  # noqa: E402
+
+BASE_URL = "http://example.com/dir/page.html"
+TYPES = ["links", "images", "scripts", "text"]
+
+
+def legacy(html: str, base_url: str = BASE_URL) -> dict:
+    soup = BeautifulSoup(html, "lxml")
+    return {
+        "title": soup.title.get_text().strip() if soup.title else "",
+        "links": main.extract_links(soup, base_url),
+        "images": main.extract_images(soup, base_url),
+        "scripts": main.extract_scripts(soup),
+        # extract_text removes script/style from the soup, so it goes last
+        "text": main.extract_text(soup),
+    }
+
+
+def assert_parity(html: str, base_url: str = BASE_URL) -> None:
+    assert extract_page(html, base_url, TYPES) == legacy(html, base_url)
+
+
+PAGES = {
+    "string containers": (
+        "<html><head><title> Title &amp; more </title><style>p { color: red }</style></head><body>"
+        "<p>before<script>var s = '<a href=\"/not-a-link\">';</script>after</p>"
+        "<template><p>template text</p><a href='/in-template'>t</a></template>"
+        "<ruby>kanji<rp>(</rp><rt>reading</rt><rp>)</rp></ruby>"
+        "<a href='/ruby'>x<rt>annotation</rt>y</a>"
+        "<script></script><script>second()</script></body></html>"
+    ),
+    "pre and textarea": (
+        "<body><pre>  indented\n\n   lines  </pre><textarea>\n  typed  \n</textarea>"
+        "<p>   </p><p>\n\n</p><a href='/pre'><pre> inside </pre>\n\n </a></body>"
+    ),
+    "nested anchors": (
+        "<body><a href='/1'>one<a href='/2'>two</a>three</a>"
+        "<a href='/1'>duplicate</a><a>no href</a><a href=''>empty</a>"
+        "<a href='/3'><span>deep <b>text</b></span></a></body>"
+    ),
+    "inline styles": (
+        "<body><div style=\"background: url('a.png')\"></div><img src='a.png'>"
+        "<span style='x: url(\"/b.png\"); y: url(c.png)'></span><img src='a.png'>"
+        "<p style='color: red'>no url</p><img src=''><img></body>"
+    ),
+    "entities and whitespace": (
+        "<head><title>\n A\tB \n</title></head><body><p>a&nbsp;b &amp;amp; c&#160;d</p>"
+        "<p>&lt;b&gt;not a tag&lt;/b&gt;</p>\t\r\n<div>tail</div></body>"
+    ),
+    "no title": "<body><a href='mailto:a@example.com'>mail</a><a href='tel:123'>call</a></body>",
+    "unclosed tags": "<title>open<body><a href='/x'>x<p>para<img src='i.png'>",
+    "empty": "",
+}
+
+
+@pytest.mark.parametrize("name", sorted(PAGES))
+def test_matches_bs4(name):
+    assert_parity(PAGES[name])
+
+
+@pytest.mark.parametrize("page", [
+    pytest.param(mixed_page(256 * 1024), id="mixed"),
+    pytest.param(links_page(2000), id="links"),
+    pytest.param(images_page(2000), id="images"),
+    pytest.param(styles_page(2000), id="styles"),
+])
+def test_matches_bs4_on_benchmark_pages(page):
+    assert_parity(page.decode("utf-8"))
+
+
+HREFS = [
+    "/absolute", "/a/b?q=1#f", "//cdn.example.com/x", "relative", "img/a.png", "a/b/../c",
+    "../up", "./dot", ".", "..", "?query", "#fragment", "", "a;params", "/a;params", "/a/./b",
+    "/a/../b", "?#", "/path?", "/path#", "x?y#z", "/tab\there", " /leading-space", "/new\nline",
+    "http://other.example.com/", "https://secure.example.com", "mailto:a@example.com",
+    "javascript:void(0)", "data:image/png;base64,AAAA", "a\\b", "%2Fencoded", "~user",
+    "-dash", "C:/windows", "a:b", "/a//b", "a//b", "/ä", "ümlaut",
+]
+BASES = [
+    BASE_URL, "http://example.com", "http://example.com/", "https://example.com/a/b/",
+    "http://example.com/a;p/b", "http://example.com/a/./b", "http://example.com//x/y",
+    "http://example.com/dir/page.html?q=1#f", "ftp://example.com/dir/file", "about:blank",
+]
+
+
+@pytest.mark.parametrize("base_url", BASES)
+def test_url_joiner_matches_urljoin(base_url):
+    joiner = UrlJoiner(base_url)
+    for href in HREFS:
+        assert joiner(href) == urljoin(base_url, href), href
+        # Memoized results must not change
+        assert joiner(href) == urljoin(base_url, href), href
+
+
+@pytest.mark.parametrize("base_url", BASES)
+def test_links_and_images_resolve_like_bs4(base_url):
+    html = "".join(f"<a href='{href}'>{index}</a><img src='{href}'>" for index, href in enumerate(HREFS) if "'" not in href)
+    assert_parity("<body>" + html + "</body>", base_url)
+
+
+def large_page(count: int) -> str:
+    # Several early-stop slices long, with the same items repeated to exercise deduplication
+    filler = "<p>" + "filler text " * 100 + "</p>"
+    items = "".join(f"<a href='/link/{index % (count // 2)}'>link {index}</a>"
+                    f"<img src='/img/{index}.png'><div style=\"background: url('/bg/{index}.png')\"></div>{filler}"
+                    for index in range(count))
+    return "<html><head><title>Large</title></head><body>" + items + "</body></html>"
+
+
+@pytest.mark.parametrize("kind", ["links", "images"])
+@pytest.mark.parametrize("limit", [1, 7, 300, 10000])
+def test_limit_is_a_prefix_of_the_full_result(kind, limit):
+    html = large_page(400)
+    assert len(html) > 4 * EARLY_STOP_SLICE
+    expected = legacy(html)[kind][:limit]
+    assert extract_page(html, BASE_URL, [kind], limit)[kind] == expected
+    assert extract_page(html, BASE_URL, [kind, "title"], limit) == {"title": "Large", kind: expected}
+
+
+def test_title_stops_early_with_the_same_title():
+    html = large_page(400)
+    assert extract_page(html, BASE_URL, ["title"]) == {"title": legacy(html)["title"]}
+    # A <title> in the body still counts when the head has none
+    html = "<body>" + "<p>x</p>" * 20000 + "<title>Late</title></body>"
+    assert extract_page(html, BASE_URL, ["title"]) == {"title": legacy(html)["title"]}